@@ -0,0 +1,187 @@
+"""
+asyncio fetch engine for calendar pages that don't need a browser.
+
+The threaded scraper has one page in flight per browser. With cookies
+harvested from one warm browser (http_fetcher.HybridFetcher.export_session),
+this engine keeps dozens of pages in flight from a single process:
+
+- `concurrency` worker coroutines share one keep-alive aiohttp session
+- every request has a timeout
+- timeouts, connection errors and 429/5xx responses are retried with
+  exponential backoff and full jitter
+- pages still pass through the shared rate limiter (reserve() + asyncio.sleep)
+- pages are parsed by the same functions as the threaded path, so
+  scrape_units gives scrape_unit_data's records and scrape_days gives
+  scrape_day_data's records
+
+With a metrics.Metrics, every request is timed as the "http_fetch" phase,
+and retries, timeouts and challenges are counted there as they happen.
+
+Challenge pages are not retried. The unit comes back as None, so the caller
+can hand it to the browser. Cancelling a run (Ctrl-C, or cancelling the
+task) stops the workers, waits for them to unwind and closes the session.
+
+aiohttp is an optional dependency (pip install aiohttp).
+"""
+import asyncio
+import random
+import time
+
+try:
+    import aiohttp
+except ImportError:  # Optional: only the async engine needs it
+    aiohttp = None
+
+from calendar_parser import parse_calendar_html, parse_fetch_unit
+from fetch_planner import day_url
+from http_fetcher import PAGE_CHALLENGE, PAGE_OK, classify_response, rewrite_url
+from metrics import CLOUDFLARE_BLOCKS, RETRIES, TIMEOUTS
+
+DEFAULT_CONCURRENCY = 32
+_RETRY_STATUSES = (429, 500, 502, 504)
+
+
+class AsyncFetchEngine:
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, timeout=15, retries=3, backoff=0.5, max_backoff=8.0,
+                 cookies=None, headers=None, rate_limiter=None, base_url=None, metrics=None):
+        if aiohttp is None:
+            raise RuntimeError("The async fetch engine needs aiohttp: pip install aiohttp")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cookies = cookies or {}
+        self.headers = headers or {}
+        self.rate_limiter = rate_limiter
+        self.base_url = base_url
+        self.metrics = metrics
+        self._in_flight = 0
+        self._stats = {"pages": 0, "retries": 0, "timeouts": 0, "challenges": 0, "failed": 0, "peak_in_flight": 0}
+
+    def stats(self):
+        return dict(self._stats, in_flight=self._in_flight)
+
+    def _count(self, stat, metric=None, **fields):
+        self._stats[stat] += 1
+        if metric is not None and self.metrics is not None:
+            self.metrics.count(metric, source="async", **fields)
+
+    def _retry_delay(self, attempt):
+        # Full jitter: spreads retries out instead of sending them in synchronized waves
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def fetch_page(self, session, url):
+        """Returns the page HTML, or None after a challenge or once the retries run out."""
+        for attempt in range(self.retries + 1):
+            if self.rate_limiter is not None:
+                await asyncio.sleep(self.rate_limiter.reserve())
+            self._in_flight += 1
+            self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self._in_flight)
+            start = time.perf_counter()
+            try:
+                async with session.get(rewrite_url(url, self.base_url)) as response:
+                    status = response.status
+                    page_html = await response.text()
+            except asyncio.TimeoutError:
+                self._count("timeouts", TIMEOUTS, url=url)
+                status, page_html = None, None
+            except aiohttp.ClientError as e:
+                print(f"[Async] {url}: {e}")
+                status, page_html = None, None
+            finally:
+                self._in_flight -= 1
+                if self.metrics is not None:
+                    self.metrics.observe("http_fetch", time.perf_counter() - start)
+
+            if status is not None and status not in _RETRY_STATUSES:
+                kind = classify_response(status, page_html)
+                if kind == PAGE_OK:
+                    self._count("pages")
+                    if self.rate_limiter is not None and hasattr(self.rate_limiter, "on_success"):
+                        self.rate_limiter.on_success()
+                    return page_html
+                if kind == PAGE_CHALLENGE:
+                    self._count("challenges", CLOUDFLARE_BLOCKS, url=url)
+                    if self.rate_limiter is not None and hasattr(self.rate_limiter, "on_throttle"):
+                        self.rate_limiter.on_throttle("Cloudflare challenge (async)")
+                    return None
+            elif status == 429 and self.rate_limiter is not None and hasattr(self.rate_limiter, "on_throttle"):
+                self.rate_limiter.on_throttle("HTTP 429 (async)")
+            if attempt < self.retries:
+                self._count("retries", RETRIES, url=url)
+                await asyncio.sleep(self._retry_delay(attempt))
+        self._count("failed")
+        return None
+
+    async def _run_jobs(self, jobs, on_result):
+        """
+        jobs: [(key, url, parse)]. Calls on_result(key, events or None) as pages
+        finish; with parse None, on_result gets the raw HTML instead and runs on
+        a thread, so it may block (e.g. pipeline.StagedPipeline.put applying backpressure).
+        """
+        queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency)
+
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector, cookies=self.cookies,
+                                         headers=self.headers) as session:
+            async def worker():
+                while True:
+                    try:
+                        key, url, parse = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    page_html = events = None
+                    try:
+                        page_html = await self.fetch_page(session, url)
+                        if parse is not None and page_html is not None:
+                            # lxml releases the GIL while parsing, so other pages keep downloading
+                            events = await asyncio.to_thread(parse, page_html)
+                    except Exception as e:
+                        # One bad page (a decode error, a body lxml can't read...) must not abort the run
+                        print(f"[Async] {url}: {e!r}; leaving it to the browser")
+                        self._count("failed")
+                        page_html = events = None
+                    if parse is None:
+                        await asyncio.to_thread(on_result, key, page_html)
+                    else:
+                        on_result(key, events)
+
+            workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(jobs)) or 1)]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                # On cancellation, stop the other workers and let them unwind before the session closes
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+    async def scrape_units(self, units, on_result, parse=True):
+        """
+        Fetches planned FetchUnits. on_result(unit, events) gets None for units
+        the browser must load. With parse=False it gets (unit, page_html) instead.
+        """
+        jobs = [(unit, unit.url, (lambda page_html, unit=unit: parse_fetch_unit(page_html, unit)) if parse else None)
+                for unit in units]
+        await self._run_jobs(jobs, on_result)
+
+    async def scrape_days(self, dates):
+        """Same records as scrape_day_data, as {date: events}; days that failed map to None."""
+        results = {}
+        jobs = [(day, day_url(day), lambda page_html, day=day: parse_calendar_html(page_html, day)) for day in dates]
+        await self._run_jobs(jobs, results.__setitem__)
+        return results
+
+    def run_units(self, units, on_result, parse=True):
+        """Blocking wrapper around scrape_units. Returns the elapsed seconds."""
+        start = time.monotonic()
+        asyncio.run(self.scrape_units(units, on_result, parse))
+        return time.monotonic() - start
+
+
+def format_engine_stats(stats):
+    return (f"[Async] {stats['pages']} pages, {stats['challenges']} challenges, {stats['failed']} failed, "
+            f"{stats['retries']} retries ({stats['timeouts']} timeouts), peak {stats['peak_in_flight']} in flight")
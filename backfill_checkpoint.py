@@ -0,0 +1,152 @@
+"""
+Day-level checkpoints for long backfills.
+
+As soon as a page is scraped, each of its days is recorded in an append-only
+manifest (manifest.jsonl: day, status, row count, error); the rows themselves
+are streamed to the partitioned output (see partitioned_output.py) just
+before. A crash, a Cloudflare block or a Ctrl-C therefore loses at most the
+pages that were in flight, and --resume only fetches days that are missing or
+failed.
+
+Statuses:
+    done    the day was scraped and has events
+    empty   the day was scraped and has no events
+    failed  the page for the day could not be loaded or parsed
+
+Finished days also record a hash of their parsed rows and when that content
+last changed (changed_at; updated_at is when the day was last fetched). An
+incremental refresh (refresh_days) re-fetches only unfinished days plus a
+hot window around today, and unchanged() lets the writer skip days whose
+rows hash the same as last time.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from calendar_parser import EVENT_COLUMNS
+
+DEFAULT_CHECKPOINT_DIR = "ff_checkpoint"
+
+DONE = "done"
+EMPTY = "empty"
+FAILED = "failed"
+FINISHED_STATUSES = (DONE, EMPTY)
+
+
+class BackfillCheckpoint:
+    def __init__(self, root=DEFAULT_CHECKPOINT_DIR, resume=False):
+        self.root = root
+        self.resumed = resume  # Output from earlier runs may already hold rows of any day fetched now
+        self.manifest_path = os.path.join(root, "manifest.jsonl")
+        self._lock = threading.Lock()
+        self._entries = {}
+        os.makedirs(root, exist_ok=True)
+        if resume:
+            self._load()
+        else:
+            open(self.manifest_path, "w").close()  # Fresh run, start a new manifest
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Half-written last line from a crash
+                self._entries[entry["day"]] = entry
+
+    def record_day(self, day, events, status=None, error=None):
+        """Appends one day's status and row count to the manifest."""
+        if status is None:
+            status = DONE if events else EMPTY
+        now = datetime.now().isoformat(timespec="seconds")
+        entry = {"day": day.isoformat(), "status": status, "rows": len(events), "updated_at": now}
+        if error:
+            entry["error"] = str(error)
+        with self._lock:
+            if status in FINISHED_STATUSES:
+                entry["hash"] = content_hash(events)
+                previous = self._entries.get(entry["day"])
+                same = previous is not None and previous.get("hash") == entry["hash"]
+                entry["changed_at"] = previous.get("changed_at", now) if same else now
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._entries[entry["day"]] = entry
+
+    def record_unit(self, unit, events, error=None):
+        """Records every day of a fetch_planner.FetchUnit. events=None marks them all failed."""
+        if events is None:
+            for day in unit.days():
+                self.record_day(day, [], status=FAILED, error=error or "page not loaded")
+            return
+        for day, day_events in events_by_day(unit, events):
+            self.record_day(day, day_events)
+
+    def status(self, day):
+        entry = self._entries.get(day.isoformat())
+        return entry["status"] if entry else None
+
+    def unchanged(self, day, events):
+        """True if the day is finished and its recorded rows hash the same as `events`."""
+        entry = self._entries.get(day.isoformat())
+        return (entry is not None and entry["status"] in FINISHED_STATUSES
+                and entry.get("hash") == content_hash(events))
+
+    def refresh_days(self, start_date, end_date, hot_start, hot_end):
+        """
+        Days in the range to fetch for an incremental refresh: unfinished days
+        plus every day inside the hot window hot_start..hot_end, whose pages
+        may still change (new actuals, revisions, rescheduled events).
+        """
+        return [day for day in _days(start_date, end_date)
+                if hot_start <= day <= hot_end or self.status(day) not in FINISHED_STATUSES]
+
+    def pending_days(self, start_date, end_date):
+        """Days in the range that are not finished yet (never attempted or failed)."""
+        return [day for day in _days(start_date, end_date) if self.status(day) not in FINISHED_STATUSES]
+
+    def summary(self, start_date, end_date):
+        counts = {DONE: 0, EMPTY: 0, FAILED: 0, "pending": 0, "rows": 0}
+        for day in _days(start_date, end_date):
+            entry = self._entries.get(day.isoformat())
+            counts[entry["status"] if entry else "pending"] += 1
+            counts["rows"] += entry["rows"] if entry else 0
+        return counts
+
+
+def _days(start_date, end_date):
+    current = start_date
+    while current <= end_date:
+        yield current
+        current += timedelta(days=1)
+
+
+def content_hash(events):
+    """Order-sensitive hash of a day's rows, as written to the output."""
+    rows = [[event[column] for column in EVENT_COLUMNS] for event in events]
+    return hashlib.sha256(json.dumps(rows, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def events_by_day(unit, events):
+    """Splits a page's events into (day, events) for every day of the unit, including empty ones."""
+    by_day = {}
+    for event in events:
+        by_day.setdefault(event["datetime"][:10], []).append(event)
+    return [(day, by_day.get(day.isoformat(), [])) for day in unit.days()]
+
+
+def contiguous_ranges(days):
+    """Groups sorted days into (start, end) runs of consecutive dates."""
+    ranges = []
+    for day in days:
+        if ranges and day == ranges[-1][1] + timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
@@ -0,0 +1,91 @@
+"""
+Benchmarks the asyncio fetch engine against one page in flight at a time.
+
+Both runs use the engine, with concurrency 1 and --concurrency, against the
+local stand-in server with a simulated response latency. Fetch, retry and
+parse costs are the same in both runs, so only concurrency differs. The
+records must equal what the per-element WebDriver path
+(extract_rows_webdriver, through a FakeDriver serving the same page) returns,
+which does not share the lxml parser with the engine. The server answers
+every day with the one fixture page, so dates are left out of the comparison.
+Once latency is hidden, parsing (a few ms per page) is what limits pages/s.
+
+    python benchmarks/bench_async_fetch.py --pages 200 --latency 0.05 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workets_scrapper
+from async_fetcher import AsyncFetchEngine, format_engine_stats
+from http_fetcher import HybridFetcher
+from fake_driver import FakeDriver
+from local_server import start_server
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+DEFAULT_FIXTURE = os.path.join(FIXTURES_DIR, "calendar_day_2015-01-02.html")
+
+
+def _undated(events):
+    return [dict(ev, datetime=ev["datetime"][10:]) for ev in events]
+
+
+def run(fixture_path, fixture_date, pages, latency, concurrency, challenge_every):
+    with open(fixture_path, encoding="utf-8") as f:
+        page_html = f.read()
+    dates = [fixture_date + timedelta(days=i) for i in range(pages)]
+    server, base_url = start_server(page_html, response_latency=latency, challenge_every=challenge_every)
+    try:
+        driver = FakeDriver(page_html)
+
+        fetcher = HybridFetcher(base_url=base_url)
+        fetcher.harvest(driver)
+        cookies, headers = fetcher.export_session()
+        fetcher.close()
+
+        runs = {}
+        for run_concurrency in (1, concurrency):
+            engine = AsyncFetchEngine(run_concurrency, cookies=cookies, headers=headers, base_url=base_url, retries=0)
+            start = time.perf_counter()
+            results = asyncio.run(engine.scrape_days(dates))
+            runs[run_concurrency] = (results, time.perf_counter() - start, engine.stats())
+    finally:
+        server.shutdown()
+
+    # Reference records: the per-element browser path, through a FakeDriver serving the same page
+    reference = _undated(workets_scrapper.extract_rows_webdriver(driver, fixture_date))
+    for results, _, _ in runs.values():
+        wrong = [day for day, events in results.items() if events is not None and _undated(events) != reference]
+        if wrong:
+            print(f"Async engine records differ from the per-element WebDriver path on {len(wrong)} pages.")
+            return 1
+
+    print(f"Fixture: {os.path.basename(fixture_path)}, {pages} pages, {latency * 1000:.0f} ms server latency, "
+          f"records identical to the per-element WebDriver path")
+    for run_concurrency, (results, elapsed, stats) in runs.items():
+        ok = sum(events is not None for events in results.values())
+        print(f"  {run_concurrency:3d} in flight: {ok / elapsed:8.1f} pages/s ({ok} ok)  {format_engine_stats(stats)}")
+    print(f"  speedup:        {runs[1][1] / runs[concurrency][1]:8.1f}x")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument("--date", default="2015-01-02", help="Date the fixture page is for")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the server takes per response")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--challenge-every", type=int, default=0, help="Challenge every Nth request (0: never)")
+    args = parser.parse_args()
+    sys.exit(run(args.fixture, date.fromisoformat(args.date), args.pages, args.latency, args.concurrency,
+                 args.challenge_every))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Compares browser-only page loads with the hybrid HTTP fast path.
+
+Both paths go through workets_scrapper.load_calendar_page for the same URLs.
+The browser is a FakeDriver with a simulated navigation cost, and the site is
+a local stand-in server that challenges every Nth request. Parsed events
+must be identical; the report shows time per page and the fast path's hit rate.
+
+    python benchmarks/bench_http_fetch.py --pages 50 --page-load 0.5 --challenge-every 20
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workets_scrapper
+from calendar_parser import parse_calendar_html
+from fetch_planner import day_url
+from http_fetcher import HybridFetcher, format_fetch_stats
+from rate_limiter import AdaptiveRateLimiter
+from fake_driver import FakeDriver
+from local_server import start_server
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+DEFAULT_FIXTURE = os.path.join(FIXTURES_DIR, "calendar_day_2015-01-02.html")
+
+
+def load_all(urls, driver, fixture_date):
+    events = []
+    start = time.perf_counter()
+    for url in urls:
+        page_html = workets_scrapper.load_calendar_page(driver, url)
+        events.append(parse_calendar_html(page_html, fixture_date) if page_html else None)
+    return events, time.perf_counter() - start
+
+
+def run(fixture_path, fixture_date, pages, page_load, challenge_every):
+    with open(fixture_path, encoding="utf-8") as f:
+        page_html = f.read()
+    urls = [day_url(fixture_date + timedelta(days=i)) for i in range(pages)]
+    workets_scrapper.rate_limiter = AdaptiveRateLimiter(1e9, initial_rate=1e9, log_interval=1e9)  # Measure fetching, not pacing
+    workets_scrapper.html_cache = None
+
+    workets_scrapper.http_fetcher = None
+    browser_events, browser_elapsed = load_all(urls, FakeDriver(page_html, page_load_latency=page_load), fixture_date)
+
+    server, base_url = start_server(page_html, challenge_every=challenge_every, require_cookie="cf_clearance=")
+    fetcher = HybridFetcher(base_url=base_url)
+    workets_scrapper.http_fetcher = fetcher
+    try:
+        hybrid_events, hybrid_elapsed = load_all(urls, FakeDriver(page_html, page_load_latency=page_load), fixture_date)
+    finally:
+        workets_scrapper.http_fetcher = None
+        fetcher.close()
+        server.shutdown()
+
+    if browser_events != hybrid_events:
+        print("Browser and hybrid paths returned different events.")
+        return 1
+    stats = fetcher.stats()
+    print(f"Fixture: {os.path.basename(fixture_path)}, {pages} pages, identical output")
+    print(f"Simulated browser navigation: {page_load * 1000:.0f} ms, server challenges every {challenge_every or '-'} requests")
+    print(f"  browser only: {browser_elapsed / pages * 1000:8.1f} ms/page")
+    print(f"  hybrid:       {hybrid_elapsed / pages * 1000:8.1f} ms/page")
+    print(f"  speedup:      {browser_elapsed / hybrid_elapsed:8.1f}x")
+    print(format_fetch_stats(stats))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument("--date", default="2015-01-02", help="Date the fixture page is for")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--page-load", type=float, default=0.5, help="Seconds per simulated browser navigation")
+    parser.add_argument("--challenge-every", type=int, default=20, help="Challenge every Nth HTTP request (0: never)")
+    args = parser.parse_args()
+    sys.exit(run(args.fixture, date.fromisoformat(args.date), args.pages, args.page_load, args.challenge_every))
+
+
+if __name__ == "__main__":
+    main()
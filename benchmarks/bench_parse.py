@@ -0,0 +1,70 @@
+"""
+Compares the per-element WebDriver extraction with the single page_source parse.
+
+Both paths run against a synthetic calendar page served by FakeDriver. The rows
+must be identical; the timings show what the IPC round trips cost.
+
+    python benchmarks/bench_parse.py --latency 0.002
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calendar_parser import parse_calendar_html
+from workets_scrapper import extract_rows_webdriver
+from fake_driver import FakeDriver
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+DEFAULT_FIXTURE = os.path.join(FIXTURES_DIR, "calendar_day_2015-01-02.html")
+
+
+def run(fixture_path, fixture_date, latency, repeat):
+    with open(fixture_path, encoding="utf-8") as f:
+        page_html = f.read()
+
+    driver = FakeDriver(page_html, call_latency=latency)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        old_rows = extract_rows_webdriver(driver, fixture_date)
+    old_elapsed = (time.perf_counter() - start) / repeat
+    old_calls = driver.calls // repeat
+
+    driver = FakeDriver(page_html, call_latency=latency)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        new_rows = parse_calendar_html(driver.page_source, fixture_date)
+    new_elapsed = (time.perf_counter() - start) / repeat
+    new_calls = driver.calls // repeat
+
+    if old_rows != new_rows:
+        for i, (old, new) in enumerate(zip(old_rows, new_rows)):
+            if old != new:
+                print(f"First mismatch at row {i}:\n  webdriver:   {old}\n  page_source: {new}")
+                break
+        print(f"Row counts: webdriver={len(old_rows)} page_source={len(new_rows)}")
+        return 1
+
+    print(f"Fixture: {os.path.basename(fixture_path)} ({len(new_rows)} events, identical output)")
+    print(f"Simulated WebDriver call latency: {latency * 1000:.1f} ms")
+    print(f"  per-element: {old_elapsed * 1000:8.1f} ms/page  {old_calls:5d} driver calls")
+    print(f"  page_source: {new_elapsed * 1000:8.1f} ms/page  {new_calls:5d} driver calls")
+    print(f"  speedup:     {old_elapsed / new_elapsed:8.1f}x")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument("--date", default="2015-01-02", help="Date the fixture page is for")
+    parser.add_argument("--latency", type=float, default=0.002, help="Seconds per simulated WebDriver call")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    sys.exit(run(args.fixture, date.fromisoformat(args.date), args.latency, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+A stand-in WebDriver backed by a synthetic calendar page.
+
+It answers the small set of locators the scrapers use (simple tag.class[attr]
+CSS selectors and tag names) from an lxml tree, and sleeps call_latency seconds
+on every call to mimic the WebDriver IPC round trip of a real browser.
+
+WebElement.text is emulated with lxml's text_content(), independently of
+calendar_parser.element_text, so comparing the per-element path with the
+page_source parser also checks element_text.
+"""
+import copy
+import os
+import re
+import time
+
+from lxml import html as lxml_html
+from selenium.common.exceptions import NoSuchElementException
+
+_SIMPLE_SELECTOR = re.compile(r'^(?P<tag>[\w-]+)?(?P<classes>(?:\.[\w-]+)*)(?P<attr>\[[\w-]+\])?$')
+
+
+def _selector_to_xpath(by, value):
+    if by == "tag name":
+        return f".//{value}"
+    if by != "css selector":
+        raise ValueError(f"FakeDriver does not support locator strategy {by!r}")
+    steps = []
+    for part in value.split():
+        match = _SIMPLE_SELECTOR.match(part)
+        if not match:
+            raise ValueError(f"FakeDriver does not support selector {value!r}")
+        predicates = [f"contains(concat(' ', normalize-space(@class), ' '), ' {c} ')"
+                      for c in match.group('classes').split('.') if c]
+        if match.group('attr'):
+            predicates.append('@' + match.group('attr')[1:-1])
+        step = match.group('tag') or '*'
+        if predicates:
+            step += '[' + ' and '.join(predicates) + ']'
+        steps.append(step)
+    return './/' + '//'.join(steps)
+
+
+def _element_text(node):
+    """Rendered text of a node as Selenium reports it for the calendar cells: no script/style, whitespace collapsed."""
+    node = copy.deepcopy(node)
+    for hidden in node.xpath(".//script | .//style"):
+        hidden.drop_tree()
+    return " ".join(node.text_content().split())
+
+
+class FakeCounter:
+    def __init__(self, call_latency):
+        self.call_latency = call_latency
+        self.calls = 0
+
+    def hit(self):
+        self.calls += 1
+        if self.call_latency:
+            time.sleep(self.call_latency)
+
+
+class FakeElement:
+    def __init__(self, node, counter):
+        self._node = node
+        self._counter = counter
+
+    def find_element(self, by, value):
+        found = self.find_elements(by, value)
+        if not found:
+            raise NoSuchElementException(value)
+        return found[0]
+
+    def find_elements(self, by, value):
+        self._counter.hit()
+        return [FakeElement(n, self._counter) for n in self._node.xpath(_selector_to_xpath(by, value))]
+
+    @property
+    def text(self):
+        self._counter.hit()
+        return _element_text(self._node)
+
+    def get_attribute(self, name):
+        self._counter.hit()
+        return self._node.get(name, "")
+
+
+class FakeDriver:
+    """Serves one HTML document for every URL."""
+
+    def __init__(self, page_html, call_latency=0.0, page_load_latency=0.0):
+        self._page_html = page_html
+        self._document = lxml_html.fromstring(page_html)
+        self._counter = FakeCounter(call_latency)
+        self.page_load_latency = page_load_latency
+        self.current_url = None
+        self.browser_pid = os.getpid()  # browser_profile.driver_rss_mb measures this process instead of Chrome
+        self.user_agent = "Mozilla/5.0 (FakeDriver)"
+        self.cookies = [{"name": "cf_clearance", "value": "fake-clearance", "domain": ".forexfactory.com", "path": "/"}]
+
+    @property
+    def calls(self):
+        return self._counter.calls
+
+    def get(self, url):
+        self._counter.hit()
+        if self.page_load_latency:
+            time.sleep(self.page_load_latency)
+        self.current_url = url
+
+    def refresh(self):
+        self.get(self.current_url)
+
+    @property
+    def page_source(self):
+        self._counter.hit()
+        return self._page_html
+
+    def _row_count(self):
+        return len(self._document.xpath(_selector_to_xpath("css selector", "table.calendar__table tr.calendar__row")))
+
+    def get_cookies(self):
+        self._counter.hit()
+        return [dict(cookie) for cookie in self.cookies]
+
+    def execute_script(self, script, *args):
+        self._counter.hit()
+        if "navigator.userAgent" in script:
+            return self.user_agent
+        if "navigator.language" in script:
+            return "en-US"
+        if "getEntriesByType('navigation')" in script:  # browser_profile.navigation_timing
+            load_ms = self.page_load_latency * 1000
+            return {"dom_content_loaded": load_ms, "load": load_ms, "resources": 0,
+                    "transfer_bytes": len(self._page_html)}
+        if "calendar__row" in script:  # page_ready polling script
+            rows = self._row_count()
+            return ["complete", rows, 1000, rows == 0 and "There are no news events scheduled" in self._page_html]
+        return 1000
+
+    def execute_async_script(self, script, *args):
+        self._counter.hit()
+        rows = self._row_count()
+        status = "ready" if rows else ("empty" if "There are no news events scheduled" in self._page_html else "timeout")
+        return [status, rows, 0]
+
+    def set_script_timeout(self, seconds):
+        self._counter.hit()
+
+    def find_element(self, by, value):
+        return FakeElement(self._document, self._counter).find_element(by, value)
+
+    def find_elements(self, by, value):
+        return FakeElement(self._document, self._counter).find_elements(by, value)
+
+    def quit(self):
+        pass
@@ -0,0 +1,85 @@
+"""
+A local stand-in for the Forex Factory calendar over HTTP.
+
+Serves a synthetic calendar page for every /calendar URL, optionally after
+response_latency seconds, and answers every challenge_every-th request with a
+Cloudflare-style 403 interstitial. Requests without the cookie the browser
+would hold can be challenged too (require_cookie). The scrapers' HTTP paths
+can then be exercised without touching the real site:
+
+    server, base_url = start_server(page_html)
+    fetcher = HybridFetcher(base_url=base_url)
+    ...
+    server.shutdown()
+"""
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHALLENGE_HTML = """<!DOCTYPE html><html><head><title>Just a moment...</title></head>
+<body><div id="challenge-platform">Checking your browser before accessing the site.</div></body></html>"""
+
+
+class CalendarServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 drops SYNs above 5 connections in flight, and each
+    # dropped one waits ~1 s for the retransmit, which swamps the async timings
+    request_queue_size = 128
+
+    def __init__(self, address, page_html, response_latency=0.0, challenge_every=0, require_cookie=None):
+        super().__init__(address, _CalendarHandler)
+        self.page_bytes = page_html.encode("utf-8")
+        self.response_latency = response_latency
+        self.challenge_every = challenge_every
+        self.require_cookie = require_cookie
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.challenges = 0
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return  # The client gave up on a slow response (a timeout test); nothing to report
+        super().handle_error(request, client_address)
+
+    def should_challenge(self, cookie_header):
+        with self.lock:
+            self.requests += 1
+            challenge = bool(self.challenge_every) and self.requests % self.challenge_every == 0
+            if self.require_cookie and self.require_cookie not in (cookie_header or ""):
+                challenge = True
+            if challenge:
+                self.challenges += 1
+            return challenge
+
+
+class _CalendarHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real site
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes
+
+    def do_GET(self):
+        server = self.server
+        if server.response_latency:
+            threading.Event().wait(server.response_latency)
+        if not self.path.startswith("/calendar"):
+            self._send(404, b"not found")
+        elif server.should_challenge(self.headers.get("Cookie")):
+            self._send(403, CHALLENGE_HTML.encode("utf-8"))
+        else:
+            self._send(200, server.page_bytes)
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(page_html, port=0, **options):
+    """Starts a CalendarServer on 127.0.0.1 in a daemon thread. Returns (server, base_url)."""
+    server = CalendarServer(("127.0.0.1", port), page_html, **options)
+    threading.Thread(target=server.serve_forever, name="calendar-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/calendar"
@@ -0,0 +1,349 @@
+"""
+Offline benchmark suite: synthetic fixtures, a fake WebDriver and a local
+stand-in server. Needs no network, no Chrome and no display.
+
+Scenarios (--only to pick some):
+
+    webdriver_extract  per-element extraction (find_element/parse_impact) through FakeDriver
+    browser_day        scrape_day_data: driver.get, readiness wait, page_source, parse
+    browser_week       the batch path for a week page: load_calendar_page + parse_fetch_unit
+    scroll_fallback    scroll_to_bottom, the fixed-sleep fallback after a readiness timeout
+    http_fetch         HybridFetcher against the local server, one page at a time
+    async_fetch        AsyncFetchEngine against the local server (needs aiohttp)
+    replay_parse       parsing week pages on the pipeline's process pool (includes starting it)
+
+For each scenario it reports pages/s, events/s, p50/p90/p99 per phase and
+the peak Python heap (tracemalloc, in a separate short pass so it doesn't
+slow the timed run). tracemalloc doesn't see lxml's C allocations, so the
+process's peak RSS is reported as well. Setup such as starting the
+local server is not timed. --json saves a run, and --compare
+prints the change from a saved run. With --compare, the exit status is 1
+if any pages/s figure dropped more than --threshold.
+
+    python benchmarks/suite.py --json before.json
+    python benchmarks/suite.py --compare before.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import async_fetcher
+import workets_scrapper
+from calendar_parser import parse_calendar_html
+from fetch_planner import FetchUnit, day_url
+from http_fetcher import HybridFetcher
+from pipeline import StagedPipeline, parse_unit_page
+from rate_limiter import AdaptiveRateLimiter
+from fake_driver import FakeDriver
+from local_server import start_server
+
+TOTAL = "total"  # Phase each scenario wraps around its measured work, excluding setup such as server start
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+DAY_FIXTURE = os.path.join(FIXTURES_DIR, "calendar_day_2015-01-02.html")
+DAY_FIXTURE_DATE = date(2015, 1, 2)
+WEEK_FIXTURE = os.path.join(FIXTURES_DIR, "calendar_week_2014-12-28.html")
+WEEK_FIXTURE_START = date(2014, 12, 28)
+WEEK_UNIT = FetchUnit("week", WEEK_FIXTURE_START, WEEK_FIXTURE_START + timedelta(days=6),
+                      WEEK_FIXTURE_START, WEEK_FIXTURE_START + timedelta(days=6))
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+class PhaseTimer:
+    """Collects durations per phase, either around a block or around a module function."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[name].append(time.perf_counter() - start)
+
+    @contextlib.contextmanager
+    def wrap(self, owner, attribute, name):
+        """Times every call to owner.attribute (a module function or an object's method) as phase `name`."""
+        original = getattr(owner, attribute)
+
+        def timed(*args, **kwargs):
+            with self.phase(name):
+                return original(*args, **kwargs)
+
+        setattr(owner, attribute, timed)
+        try:
+            yield
+        finally:
+            setattr(owner, attribute, original)
+
+
+def _quiet_scraper():
+    """Module state for calling scraper functions outside main(): no pacing, no cache, no fast path."""
+    workets_scrapper.rate_limiter = AdaptiveRateLimiter(1e9, initial_rate=1e9, log_interval=1e9)
+    workets_scrapper.html_cache = None
+    workets_scrapper.http_fetcher = None
+
+
+def scenario_webdriver_extract(opts, timer):
+    driver = FakeDriver(_read(DAY_FIXTURE), call_latency=opts.call_latency)
+    pages = min(opts.pages, opts.extract_pages)
+    events = 0
+    with timer.wrap(workets_scrapper, "parse_impact", "parse_impact"), timer.phase(TOTAL):
+        for _ in range(pages):
+            with timer.phase("page"):
+                events += len(workets_scrapper.extract_rows_webdriver(driver, DAY_FIXTURE_DATE))
+    return pages, events
+
+
+@contextlib.contextmanager
+def _timed_browser(timer, driver, parse_name):
+    """Times the browser path's phases: navigation, readiness wait, scroll fallback and parse."""
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(timer.wrap(driver, "get", "driver.get"))
+        stack.enter_context(timer.wrap(workets_scrapper, "wait_for_calendar_ready", "wait"))
+        stack.enter_context(timer.wrap(workets_scrapper, "scroll_to_bottom", "scroll"))
+        stack.enter_context(timer.wrap(workets_scrapper, parse_name, "parse"))
+        yield
+
+
+def scenario_browser_day(opts, timer):
+    _quiet_scraper()
+    driver = FakeDriver(_read(DAY_FIXTURE), call_latency=opts.call_latency, page_load_latency=opts.page_load)
+    events = 0
+    with _timed_browser(timer, driver, "parse_calendar_html"), timer.phase(TOTAL):
+        for _ in range(opts.pages):
+            with timer.phase("page"):
+                events += len(workets_scrapper.scrape_day_data(driver, DAY_FIXTURE_DATE))
+    return opts.pages, events
+
+
+def scenario_browser_week(opts, timer):
+    _quiet_scraper()
+    driver = FakeDriver(_read(WEEK_FIXTURE), call_latency=opts.call_latency, page_load_latency=opts.page_load)
+    events = 0
+    with _timed_browser(timer, driver, "parse_fetch_unit"), timer.phase(TOTAL):
+        for _ in range(opts.pages):
+            with timer.phase("page"):
+                events += len(workets_scrapper.scrape_unit_data(driver, WEEK_UNIT))
+    return opts.pages, events
+
+
+def scenario_scroll_fallback(opts, timer):
+    driver = FakeDriver(_read(DAY_FIXTURE), call_latency=opts.call_latency)
+    with timer.phase("scroll"), timer.phase(TOTAL):
+        workets_scrapper.scroll_to_bottom(driver)
+    return 1, 0
+
+
+def scenario_http_fetch(opts, timer):
+    page_html = _read(DAY_FIXTURE)
+    server, base_url = start_server(page_html, response_latency=opts.server_latency)
+    fetcher = HybridFetcher(base_url=base_url)
+    fetcher.harvest(FakeDriver(page_html))
+    events = 0
+    pages = 0
+    try:
+        with timer.phase(TOTAL):
+            for i in range(opts.pages):
+                target = DAY_FIXTURE_DATE + timedelta(days=i)
+                with timer.phase("page"):
+                    with timer.phase("fetch"):
+                        fetched = fetcher.fetch(day_url(target))
+                    if fetched is None:
+                        continue
+                    with timer.phase("parse"):
+                        events += len(parse_calendar_html(fetched, target))
+                pages += 1
+    finally:
+        fetcher.close()
+        server.shutdown()
+    return pages, events
+
+
+def scenario_async_fetch(opts, timer):
+    if async_fetcher.aiohttp is None:
+        return None
+    page_html = _read(DAY_FIXTURE)
+    server, base_url = start_server(page_html, response_latency=opts.server_latency)
+    engine = async_fetcher.AsyncFetchEngine(opts.concurrency, base_url=base_url, retries=0)
+    dates = [DAY_FIXTURE_DATE + timedelta(days=i) for i in range(opts.pages)]
+    try:
+        # wrap() would only time creating the coroutine, so time the awaited fetch
+        original = engine.fetch_page
+
+        async def timed_fetch(session, url):
+            start = time.perf_counter()
+            try:
+                return await original(session, url)
+            finally:
+                timer.samples["fetch"].append(time.perf_counter() - start)
+
+        engine.fetch_page = timed_fetch
+        with timer.phase(TOTAL):
+            results = asyncio.run(engine.scrape_days(dates))
+    finally:
+        server.shutdown()
+    ok = [events for events in results.values() if events is not None]
+    return len(ok), sum(len(events) for events in ok)
+
+
+def scenario_replay_parse(opts, timer):
+    page_html = _read(WEEK_FIXTURE)
+    events = 0
+    pages = 0
+
+    def write(key, page_events, error):
+        nonlocal events, pages
+        pages += 1
+        events += len(page_events or ())
+
+    with timer.phase(TOTAL):
+        with StagedPipeline(parse_unit_page, write, opts.parse_workers) as replay_pipeline:
+            for _ in range(opts.pages):
+                replay_pipeline.put(WEEK_UNIT, page_html)
+    return pages, events
+
+
+SCENARIOS = {
+    "webdriver_extract": scenario_webdriver_extract,
+    "browser_day": scenario_browser_day,
+    "browser_week": scenario_browser_week,
+    "scroll_fallback": scenario_scroll_fallback,
+    "http_fetch": scenario_http_fetch,
+    "async_fetch": scenario_async_fetch,
+    "replay_parse": scenario_replay_parse,
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(name, opts):
+    timer = PhaseTimer()
+    with contextlib.redirect_stdout(io.StringIO()):  # The scraper logs every page
+        result = SCENARIOS[name](opts, timer)
+    if result is None:
+        return None
+    pages, events = result
+    elapsed = timer.samples.pop(TOTAL)[0]
+
+    # Separate pass for the Python heap: tracemalloc slows allocation-heavy code down considerably
+    memory_opts = argparse.Namespace(**dict(vars(opts), pages=min(opts.pages, 5)))
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        SCENARIOS[name](memory_opts, PhaseTimer())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    phases = {}
+    for phase, samples in timer.samples.items():
+        samples = sorted(samples)
+        phases[phase] = {"count": len(samples), "p50_ms": percentile(samples, 0.5) * 1000,
+                         "p90_ms": percentile(samples, 0.9) * 1000, "p99_ms": percentile(samples, 0.99) * 1000}
+    return {"pages": pages, "events": events, "seconds": elapsed, "pages_per_sec": pages / elapsed,
+            "events_per_sec": events / elapsed, "peak_mem_mb": peak / 1024 ** 2, "phases": phases}
+
+
+def max_rss_mb():
+    """Peak resident memory of this process so far, including lxml and other C allocations."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def print_results(results):
+    for name, result in results.items():
+        if result is None:
+            print(f"{name:<18} skipped (optional dependency missing)")
+            continue
+        print(f"{name:<18} {result['pages_per_sec']:9.1f} pages/s {result['events_per_sec']:10.1f} events/s "
+              f"{result['peak_mem_mb']:7.1f} MB Python heap  ({result['pages']} pages in {result['seconds']:.2f}s)")
+        for phase, stats in result["phases"].items():
+            print(f"    {phase:<22} p50 {stats['p50_ms']:9.2f} ms  p90 {stats['p90_ms']:9.2f} ms  "
+                  f"p99 {stats['p99_ms']:9.2f} ms  (n={stats['count']})")
+
+
+def compare(baseline, current, threshold):
+    """Prints per-scenario changes. Returns the scenarios whose pages/s dropped by more than threshold."""
+    regressions = []
+    print(f"\nCompared with {baseline['meta']['created']} ({baseline['meta'].get('label') or 'baseline'}):")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if result is None or base is None:
+            continue
+        change = result["pages_per_sec"] / base["pages_per_sec"] - 1
+        memory_change = result["peak_mem_mb"] - base["peak_mem_mb"]
+        flag = "  <-- slower" if change < -threshold else ""
+        print(f"  {name:<18} pages/s {base['pages_per_sec']:9.1f} -> {result['pages_per_sec']:9.1f} ({change:+.1%})  "
+              f"Python heap {memory_change:+.1f} MB{flag}")
+        for phase, stats in result["phases"].items():
+            base_stats = base["phases"].get(phase)
+            if base_stats and base_stats["p50_ms"]:
+                print(f"      {phase:<20} p50 {base_stats['p50_ms']:9.2f} -> {stats['p50_ms']:9.2f} ms "
+                      f"({stats['p50_ms'] / base_stats['p50_ms'] - 1:+.1%})")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=sorted(SCENARIOS), help="Scenarios to run (default: all)")
+    parser.add_argument("--pages", type=int, default=30, help="Pages per scenario")
+    parser.add_argument("--extract-pages", type=int, default=3,
+                        help="Pages for webdriver_extract, which takes seconds per page")
+    parser.add_argument("--call-latency", type=float, default=0.002, help="Seconds per fake WebDriver call")
+    parser.add_argument("--page-load", type=float, default=0.05, help="Seconds per fake browser navigation")
+    parser.add_argument("--server-latency", type=float, default=0.01, help="Seconds per local server response")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight for async_fetch")
+    parser.add_argument("--parse-workers", type=int, default=None, help="Parser processes for replay_parse")
+    parser.add_argument("--label", help="Name stored with --json, e.g. a commit")
+    parser.add_argument("--json", help="Save the results to this file")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.10, help="pages/s drop counted as a regression")
+    opts = parser.parse_args()
+
+    results = {}
+    for name in opts.only or SCENARIOS:
+        results[name] = run_scenario(name, opts)
+    print_results(results)
+    print(f"Process peak RSS: {max_rss_mb():.1f} MB")
+
+    run = {"meta": {"created": datetime.now().isoformat(timespec="seconds"), "label": opts.label,
+                    "python": platform.python_version(), "machine": platform.machine(),
+                    "options": {k: v for k, v in vars(opts).items() if k not in ("json", "compare")}},
+           "results": results, "max_rss_mb": max_rss_mb()}
+    if opts.json:
+        with open(opts.json, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+        print(f"\nSaved to {opts.json}")
+    if opts.compare:
+        with open(opts.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), run, opts.threshold)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
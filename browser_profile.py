@@ -0,0 +1,219 @@
+"""
+Lean Chrome profile for the scrapers, and per-driver resource reports.
+
+A default uc.Chrome downloads every image, font, ad and tracking script on
+each calendar navigation, in a maximized window. The lean profile:
+
+- disables images (content setting plus blink setting) and uses a small
+  fixed window,
+- turns off background networking, extensions and other per-process extras,
+- blocks fonts, media and known ad/analytics domains with the DevTools
+  Network.setBlockedURLs command, before the first navigation.
+
+Forex Factory's own scripts and stylesheets (forexfactory.com and its
+faireconomy.media CDN) and Cloudflare's challenge scripts
+(challenges.cloudflare.com, /cdn-cgi/) are never blocked, so the table
+renders and challenges can still be solved. setBlockedURLs only takes
+wildcard patterns, so third-party traffic is cut with a denylist rather
+than an allowlist; add patterns with extra_blocked_urls.
+
+driver_rss_mb() sums the resident memory of a driver's browser process tree
+(psutil if installed, otherwise /proc on Linux), and navigation_timing()
+reads the page's Navigation Timing entry for load time, resource count and
+bytes transferred.
+
+    python browser_profile.py --pages 5    # full vs lean on real calendar pages
+"""
+import argparse
+import os
+import time
+
+try:
+    import psutil
+except ImportError:  # Optional: /proc is read instead on Linux
+    psutil = None
+
+LEAN_WINDOW_SIZE = (1200, 900)
+
+LEAN_ARGUMENTS = (
+    "--blink-settings=imagesEnabled=false",
+    "--disable-background-networking",
+    "--disable-extensions",
+    "--disable-notifications",
+    "--disable-sync",
+    "--mute-audio",
+    "--no-default-browser-check",
+)
+
+# Resource types the calendar table does not need
+BLOCKED_RESOURCE_PATTERNS = (
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3", "*.m3u8",
+)
+
+# Third-party ad, analytics and social domains seen on the calendar pages
+BLOCKED_DOMAIN_PATTERNS = (
+    "*googletagmanager.com*", "*google-analytics.com*", "*googlesyndication.com*", "*doubleclick.net*",
+    "*googleadservices.com*", "*adservice.google.*", "*amazon-adsystem.com*", "*adnxs.com*", "*criteo.*",
+    "*taboola.com*", "*outbrain.com*", "*scorecardresearch.com*", "*quantserve.com*", "*quantcount.com*",
+    "*hotjar.com*", "*facebook.net*", "*connect.facebook.*", "*twitter.com/widgets*", "*platform.twitter.com*",
+    "*pubmatic.com*", "*rubiconproject.com*", "*openx.net*", "*casalemedia.com*", "*moatads.com*",
+)
+
+_NAVIGATION_TIMING_SCRIPT = """
+var nav = performance.getEntriesByType('navigation')[0];
+var resources = performance.getEntriesByType('resource');
+var bytes = 0;
+for (var i = 0; i < resources.length; i++) { bytes += resources[i].transferSize || 0; }
+if (!nav) { return null; }
+return {dom_content_loaded: nav.domContentLoadedEventEnd, load: nav.loadEventEnd || nav.duration,
+        resources: resources.length, transfer_bytes: bytes + (nav.transferSize || 0)};
+"""
+
+
+def apply_lean_options(options, window_size=LEAN_WINDOW_SIZE):
+    """Adds the lean arguments and content settings to a (uc.)ChromeOptions before the browser starts."""
+    for argument in LEAN_ARGUMENTS:
+        options.add_argument(argument)
+    options.add_argument(f"--window-size={window_size[0]},{window_size[1]}")
+    options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    return options
+
+
+def enable_resource_blocking(driver, extra_blocked_urls=()):
+    """Blocks non-essential requests for every later navigation of this driver (DevTools Network domain)."""
+    patterns = list(BLOCKED_RESOURCE_PATTERNS + BLOCKED_DOMAIN_PATTERNS) + list(extra_blocked_urls)
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    return len(patterns)
+
+
+def browser_pid(driver):
+    """PID of the driver's browser process: uc.Chrome knows it, plain Selenium only knows chromedriver's."""
+    pid = getattr(driver, "browser_pid", None)
+    if pid:
+        return pid
+    service = getattr(driver, "service", None)
+    process = getattr(service, "process", None)
+    return getattr(process, "pid", None)
+
+
+def _proc_children():
+    """{ppid: [pid, ...]} from /proc."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        ppid = int(stat[stat.rindex(")") + 2:].split()[1])  # The command name may contain spaces
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def _proc_rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree_rss_mb(pid):
+    """Resident memory of pid and all its descendants in MB, or None when it can't be measured."""
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / 1024 ** 2
+    if not os.path.isdir("/proc"):
+        return None
+    children = _proc_children()
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += _proc_rss_bytes(current)
+        stack.extend(children.get(current, ()))
+    return total / 1024 ** 2
+
+
+def driver_rss_mb(driver):
+    pid = browser_pid(driver)
+    return process_tree_rss_mb(pid) if pid else None
+
+
+def navigation_timing(driver):
+    """
+    Load timings of the current page in seconds plus resource count and KB
+    transferred, or None if the browser has no Navigation Timing entry.
+    """
+    try:
+        timing = driver.execute_script(_NAVIGATION_TIMING_SCRIPT)
+    except Exception:
+        return None
+    if not isinstance(timing, dict):
+        return None
+    return {"dom_content_loaded": timing["dom_content_loaded"] / 1000.0, "load": timing["load"] / 1000.0,
+            "resources": timing["resources"], "transfer_kb": timing["transfer_bytes"] / 1024.0}
+
+
+def format_driver_report(label, rss_mb, timings):
+    loads = sorted(t["load"] for t in timings)
+    line = f"{label}: RSS {rss_mb:.0f} MB" if rss_mb is not None else f"{label}: RSS unknown"
+    if loads:
+        line += (f", page load median {loads[len(loads) // 2]:.2f}s (max {loads[-1]:.2f}s), "
+                 f"{sum(t['resources'] for t in timings) / len(timings):.0f} resources and "
+                 f"{sum(t['transfer_kb'] for t in timings) / len(timings):.0f} KB per page")
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a full and a lean Chrome on real calendar pages.")
+    parser.add_argument("--pages", type=int, default=5, help="Calendar pages to load per browser")
+    parser.add_argument("--start", default="2024-01-08", help="First day to load, YYYY-MM-DD")
+    args = parser.parse_args()
+
+    # Only this comparison needs the browser stack
+    from datetime import date, timedelta
+    from fetch_planner import day_url
+    from page_ready import wait_for_calendar_ready
+    from workets_scrapper import setup_worker_driver
+
+    first_day = date.fromisoformat(args.start)
+    for lean in (False, True):
+        driver = setup_worker_driver(lean=lean)
+        if driver is None:
+            print("Driver setup failed.")
+            return
+        try:
+            timings = []
+            for i in range(args.pages):
+                started = time.monotonic()
+                driver.get(day_url(first_day + timedelta(days=i)))
+                ready = wait_for_calendar_ready(driver)
+                timing = navigation_timing(driver)
+                if timing is not None:
+                    timings.append(timing)
+                print(f"  {ready.rows} rows, {time.monotonic() - started:.2f}s until ready")
+            print(format_driver_report("lean" if lean else "full", driver_rss_mb(driver), timings))
+        finally:
+            driver.quit()
+
+
+if __name__ == "__main__":
+    main()
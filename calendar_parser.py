@@ -0,0 +1,266 @@
+"""
+Offline parser for Forex Factory calendar pages.
+
+Instead of asking the WebDriver for every cell of every row (one IPC round
+trip per find_element / .text / get_attribute call), the scrapers grab
+driver.page_source once and hand the HTML to parse_calendar_html, which
+walks table.calendar__table with lxml and builds the same row dicts the
+per-element code used to build. Week and month pages hold several days, so
+parse_calendar_page also reads the date header rows to date each event.
+"""
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+from lxml import html as lxml_html
+
+EVENT_COLUMNS = ['datetime', 'currency', 'impact', 'event', 'actual', 'forecast', 'previous']
+
+UNKNOWN_IMPACT_PREFIX = "Unknown Impact: "
+
+# Forex Factory shows guests times in US Eastern unless the profile says otherwise
+DEFAULT_SITE_TIMEZONE = "America/New_York"
+
+
+_CHALLENGE_MARKERS = (
+    "challenge-platform", "cf-challenge", "cf-browser-verification", "cf_chl_opt",
+    "<title>Just a moment...</title>", "Attention Required! | Cloudflare",
+)
+
+
+def is_challenge_page(page_html):
+    """True for Cloudflare interstitials ("Just a moment...") served instead of the calendar."""
+    if not page_html:
+        return False
+    return "calendar__table" not in page_html and any(marker in page_html for marker in _CHALLENGE_MARKERS)
+
+
+def _has_class(class_name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+_TABLE_XPATH = f"//table[{_has_class('calendar__table')}]"
+_ROW_XPATH = f".//tr[{_has_class('calendar__row')}]"
+
+_MONTHS = {name: i for i, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), start=1)}
+_HEADER_DATE = re.compile(r'(' + '|'.join(_MONTHS) + r')[a-z]*\s*(\d{1,2})\b', re.IGNORECASE)
+
+_EVENT_CELLS = ('time', 'currency', 'impact', 'event', 'actual', 'forecast', 'previous')
+_CELL_CLASSES = {'calendar__' + name: name for name in _EVENT_CELLS + ('date',)}
+
+
+def _index_cells(row):
+    """Maps cell name -> first td of the row carrying the calendar__<name> class."""
+    cells = {}
+    for td in row.iter('td'):
+        for class_name in td.get('class', '').split():
+            name = _CELL_CLASSES.get(class_name)
+            if name is not None and name not in cells:
+                cells[name] = td
+    return cells
+
+
+def _is_date_header(cells):
+    return 'date' in cells and cells['date'].get('colspan') is not None
+
+
+def element_text(element):
+    """Approximates WebElement.text: script/style dropped, whitespace collapsed per line."""
+    text = "".join(_iter_visible_text(element))
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line).strip()
+
+
+def _iter_visible_text(element):
+    if element.tag in ('script', 'style'):
+        return
+    if element.text:
+        yield element.text
+    for child in element:
+        if isinstance(child.tag, str):
+            is_block = child.tag in ('div', 'p', 'br', 'tr', 'li')
+            if is_block:
+                yield "\n"
+            yield from _iter_visible_text(child)
+            if is_block:
+                yield "\n"
+        if child.tail:
+            yield child.tail
+
+
+def impact_from_title(title, unknown_prefix=UNKNOWN_IMPACT_PREFIX):
+    """Maps the impact icon's title attribute to Holiday/Low/Medium/High."""
+    title = title.lower()
+    if "non-economic" in title or "holiday" in title:
+        return "Holiday"
+    elif "low impact expected" in title:
+        return "Low"
+    elif "medium impact expected" in title:
+        return "Medium"
+    elif "high impact expected" in title:
+        return "High"
+    return unknown_prefix + title
+
+
+def parse_impact_cell(impact_cell, unknown_prefix=UNKNOWN_IMPACT_PREFIX):
+    span = next(impact_cell.iter('span'), None)
+    if span is None:
+        return "N/A"
+    return impact_from_title(span.get("title", ""), unknown_prefix)
+
+
+@lru_cache(maxsize=4096)
+def format_event_datetime(target_date_obj, time_str):
+    """
+    Builds the datetime column: "YYYY-mm-dd HH:MM:SS" for timed events,
+    "YYYY-mm-dd All Day" / "YYYY-mm-dd Tentative" for untimed ones, and the
+    raw time text after the date for anything else. All Day keeps its label
+    so that it can't be mistaken for a 12:00am release.
+    """
+    date_str = target_date_obj.strftime('%Y-%m-%d')
+    if time_str.lower() == "all day":
+        return f"{date_str} All Day"
+    elif "tentative" in time_str.lower():
+        return f"{date_str} Tentative"
+    try:
+        time_part = datetime.strptime(time_str, "%I:%M%p").time()
+        return datetime.combine(target_date_obj, time_part).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return f"{date_str} {time_str}"  # Keep raw time string if parsing fails
+
+
+def migrate_legacy_all_day(datetime_str):
+    """
+    Respells a datetime written before All Day events had their own label.
+    Those runs stored All Day at "YYYY-mm-dd 00:00:00", so a midnight from
+    them becomes "YYYY-mm-dd All Day"; a 12:00am release in such data can't
+    be told apart and was always read as All Day anyway.
+    """
+    if datetime_str.endswith(" 00:00:00") and _FULL_TIMESTAMP.match(datetime_str):
+        return datetime_str[:10] + " All Day"
+    return datetime_str
+
+
+_FULL_TIMESTAMP = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+DATE_PREFIX = re.compile(r'^\d{4}-\d{2}-\d{2}(?: |$)')
+
+
+def event_sort_key(datetime_str):
+    """
+    Sort key for the datetime column. Timed events sort by timestamp; All Day,
+    Tentative and unparsed times sort at midnight of their day; anything else
+    sorts last.
+    """
+    if _FULL_TIMESTAMP.match(datetime_str):
+        return datetime_str
+    if DATE_PREFIX.match(datetime_str):
+        return datetime_str[:10] + " 00:00:00"
+    return "9999-12-31 99:99:99"
+
+
+def parse_event_row(cells):
+    """Returns the raw cell values of an event row, or None if the row is malformed."""
+    if any(name not in cells for name in _EVENT_CELLS):
+        return None
+    event_cell = cells['event']
+    event_name = element_text(event_cell)
+    if not event_name:
+        divs = event_cell.xpath(".//div")
+        if divs:
+            event_name = element_text(divs[0])
+    return (element_text(cells['time']), element_text(cells['currency']), cells['impact'], event_name,
+            element_text(cells['actual']), element_text(cells['forecast']), element_text(cells['previous']))
+
+
+def find_calendar_rows(document):
+    tables = document.xpath(_TABLE_XPATH)
+    if not tables:
+        return []
+    return tables[0].xpath(_ROW_XPATH)
+
+
+def parse_header_date(text, page_start, page_end):
+    """
+    Turns a date cell like "Fri Jan 2" into a date. The page doesn't print the
+    year, so it is taken from whichever end of the page span the date falls in.
+    """
+    match = _HEADER_DATE.search(text)
+    if not match:
+        return None
+    month = _MONTHS[match.group(1).lower()]
+    day = int(match.group(2))
+    for year in sorted({page_start.year, page_end.year}):
+        try:
+            candidate = date(year, month, day)
+        except ValueError:
+            continue
+        if page_start - timedelta(days=7) <= candidate <= page_end + timedelta(days=7):
+            return candidate
+    return None
+
+
+def parse_calendar_page(page_html, page_start, page_end=None, window=None,
+                        unknown_impact_prefix=UNKNOWN_IMPACT_PREFIX):
+    """
+    Parses a day, week or month calendar page into event dicts.
+
+    Each event gets the date of the nearest date header above it (the
+    td.calendar__date[colspan] rows, or the date cell on a day's first row);
+    rows before any header belong to page_start. A row without a time inherits
+    the time of the row above it within the same day. If window=(start, end)
+    is given, events outside it are dropped.
+    """
+    if not page_html:
+        return []
+    page_end = page_end or page_start
+    document = lxml_html.fromstring(page_html)
+    events_data = []
+    current_date = page_start
+    current_event_time_str = None
+
+    for row in find_calendar_rows(document):
+        cells = _index_cells(row)
+        date_cell = cells.get('date')
+        if date_cell is not None:
+            header_date = parse_header_date(element_text(date_cell), page_start, page_end)
+            if header_date is not None and header_date != current_date:
+                current_date = header_date
+                current_event_time_str = None
+        if _is_date_header(cells):
+            continue  # Date header row, nothing else to read
+
+        values = parse_event_row(cells)
+        if values is None:
+            continue  # Skip malformed event row
+        time_cell_text, currency, impact_cell, event_name, actual, forecast, previous = values
+
+        if time_cell_text:
+            current_event_time_str = time_cell_text
+        if not current_event_time_str:
+            continue
+        if window is not None and not window[0] <= current_date <= window[1]:
+            continue
+
+        events_data.append({
+            "datetime": format_event_datetime(current_date, current_event_time_str),
+            "currency": currency,
+            "impact": parse_impact_cell(impact_cell, unknown_impact_prefix),
+            "event": event_name,
+            "actual": actual,
+            "forecast": forecast,
+            "previous": previous
+        })
+    return events_data
+
+
+def parse_calendar_html(page_html, target_date_obj, unknown_impact_prefix=UNKNOWN_IMPACT_PREFIX):
+    """Parses a single-day calendar page into event dicts."""
+    return parse_calendar_page(page_html, target_date_obj, target_date_obj,
+                               unknown_impact_prefix=unknown_impact_prefix)
+
+
+def parse_fetch_unit(page_html, unit, unknown_impact_prefix=UNKNOWN_IMPACT_PREFIX):
+    """Parses the page of a fetch_planner.FetchUnit, trimmed to the dates it was planned for."""
+    return parse_calendar_page(page_html, unit.page_start, unit.page_end, window=(unit.start, unit.end),
+                               unknown_impact_prefix=unknown_impact_prefix)
@@ -0,0 +1,53 @@
+"""
+Command-line entry point for the scraper and its offline tools.
+
+    python cli.py backfill --start 2015-01-01 --end 2024-12-31 --workers 4
+    python cli.py day --start 2024-03-15
+    python cli.py replay --start 2015-01-01 --end 2024-12-31 --formats csv
+    python cli.py query --start 2019-01-01 --currency USD --impact High --format jsonl
+    python cli.py series forex_factory_data_20150101_to_20241231.csv --series USD "CPI m/m"
+    python cli.py watch --fast 1
+
+Each subcommand hands its arguments to the main() of the module that
+implements it (`python cli.py <command> --help` lists them). The module
+is imported only once its subcommand is chosen. The browser stack
+(undetected_chromedriver, selenium) is only imported when a browser starts,
+pandas only when partitions are sorted, and aiohttp only by --engine async.
+So replay, query and series start without any of them.
+"""
+import argparse
+import importlib
+import sys
+
+# command -> (module, arguments put before the user's, help)
+COMMANDS = {
+    "backfill": ("workets_scrapper", [], "Scrape a date range with parallel browser workers"),
+    "day": ("single_day_scrapper", [], "Scrape one day (or a short range) with a single browser"),
+    "replay": ("workets_scrapper", ["--replay"], "Rebuild a date range from the HTML cache, without a browser"),
+    "query": ("event_store", [], "Query the SQLite event store, or --import CSVs into it"),
+    "series": ("compact_events", [], "Print one series' history from a scraper CSV, via the compact event table"),
+    "watch": ("live_watch", [], "Stream new and revised actuals of today's calendar as JSON lines"),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Forex Factory calendar scraper.",
+                                     epilog="Run 'cli.py <command> --help' for the options of a command.")
+    subparsers = parser.add_subparsers(dest="command", metavar="command", required=True)
+    for name, (_, _, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text, add_help=False)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Only the command is parsed here; everything after it belongs to the command's own parser
+    args = build_parser().parse_args(argv[:1])
+    module_name, prefix, _ = COMMANDS[args.command]
+    sys.argv[0] = f"cli.py {args.command}"  # The command's usage line then names it
+    module = importlib.import_module(module_name)
+    return module.main(prefix + argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""
+Compact, column-oriented in-memory form of scraped events.
+
+A list of event dicts costs several hundred bytes per event: a 7-key dict
+plus seven separate str objects, most of them repeats ("USD", "High",
+"CPI m/m", "0.2%"). EventTable stores each column as a typed array of ids
+instead. Currencies, impacts, event names, times of day and the
+actual/forecast/previous values are interned once in StringTables, and the
+day is stored as a date ordinal, so an event is nine 4-byte ints plus its
+entry in the series index.
+
+The series index maps (currency, event name) to its rows, so the full
+history of e.g. USD "CPI m/m" is a direct lookup rather than a scan.
+Event dicts, with the same keys and values as the scrapers produce, and the
+CSV are rebuilt from the columns on demand.
+
+    table = EventTable.from_csv("forex_factory_data_20150101_to_20241231.csv")
+    for ev in table.series("USD", "CPI m/m"):
+        print(ev["datetime"], ev["actual"], ev["forecast"])
+
+    python cli.py series forex_factory_data_20150101_to_20241231.csv --series USD "CPI m/m"
+    python cli.py series forex_factory_data_20150101_to_20241231.csv --list EUR
+"""
+import argparse
+import csv
+import sys
+import time
+import tracemalloc
+from array import array
+from datetime import date
+from functools import lru_cache
+
+from calendar_parser import DATE_PREFIX, EVENT_COLUMNS, event_sort_key
+
+_ID_TYPE = "I"  # Unsigned 32-bit on every platform CPython supports
+
+
+class StringTable:
+    """Interns strings to dense int ids: values[id] is the string, id_of(string) the id."""
+    __slots__ = ("values", "_ids")
+
+    def __init__(self):
+        self.values = []
+        self._ids = {}
+
+    def intern(self, value):
+        value_id = self._ids.get(value)
+        if value_id is None:
+            value_id = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+    def id_of(self, value):
+        """The id of an already interned string, or None."""
+        return self._ids.get(value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def nbytes(self):
+        return (sys.getsizeof(self.values) + sys.getsizeof(self._ids)
+                + sum(sys.getsizeof(value) for value in self.values))
+
+
+@lru_cache(maxsize=8192)
+def _day_string(ordinal):
+    return date.fromordinal(ordinal).isoformat()
+
+
+class EventTable:
+    """
+    Events as parallel id arrays. Row i is rebuilt by event(i); iterating the
+    table yields event dicts in row order, so it can stand in for a list of
+    events wherever they are only read.
+    """
+    __slots__ = ("currencies", "impacts", "names", "times", "values",
+                 "_day", "_time", "_currency", "_impact", "_name", "_actual", "_forecast", "_previous",
+                 "_series")
+
+    def __init__(self):
+        self.currencies, self.impacts, self.names, self.times, self.values = (StringTable() for _ in range(5))
+        self._day = array(_ID_TYPE)  # Date ordinal, 0 if the datetime has no date prefix
+        self._time = array(_ID_TYPE)  # Rest of the datetime after the date (" 08:30:00", " Tentative")
+        self._currency = array(_ID_TYPE)
+        self._impact = array(_ID_TYPE)
+        self._name = array(_ID_TYPE)
+        self._actual = array(_ID_TYPE)
+        self._forecast = array(_ID_TYPE)
+        self._previous = array(_ID_TYPE)
+        self._series = {}  # (currency id, name id) -> array of row numbers
+
+    @classmethod
+    def from_events(cls, events):
+        table = cls()
+        table.extend(events)
+        return table
+
+    @classmethod
+    def from_csv(cls, path):
+        """Loads a scraper CSV (forex_factory_data_*.csv or a partition) row by row."""
+        table = cls()
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            table.extend(csv.DictReader(f))
+        return table
+
+    def append(self, event):
+        """Adds one event dict (the EVENT_COLUMNS keys) and returns its row number."""
+        row = len(self._day)
+        datetime_str = event["datetime"]
+        if DATE_PREFIX.match(datetime_str):
+            self._day.append(date.fromisoformat(datetime_str[:10]).toordinal())
+            self._time.append(self.times.intern(datetime_str[10:]))
+        else:
+            self._day.append(0)
+            self._time.append(self.times.intern(datetime_str))
+        currency_id = self.currencies.intern(event["currency"])
+        name_id = self.names.intern(event["event"])
+        self._currency.append(currency_id)
+        self._impact.append(self.impacts.intern(event["impact"]))
+        self._name.append(name_id)
+        self._actual.append(self.values.intern(event["actual"]))
+        self._forecast.append(self.values.intern(event["forecast"]))
+        self._previous.append(self.values.intern(event["previous"]))
+        rows = self._series.get((currency_id, name_id))
+        if rows is None:
+            rows = self._series[(currency_id, name_id)] = array(_ID_TYPE)
+        rows.append(row)
+        return row
+
+    def extend(self, events):
+        for event in events:
+            self.append(event)
+
+    def __len__(self):
+        return len(self._day)
+
+    def datetime(self, row):
+        day = self._day[row]
+        time_str = self.times.values[self._time[row]]
+        return _day_string(day) + time_str if day else time_str
+
+    def day(self, row):
+        """The event's date, or None if its datetime has no date."""
+        day = self._day[row]
+        return date.fromordinal(day) if day else None
+
+    def event(self, row):
+        """Row `row` as the dict the scrapers produce."""
+        values = self.values.values
+        return {
+            "datetime": self.datetime(row),
+            "currency": self.currencies.values[self._currency[row]],
+            "impact": self.impacts.values[self._impact[row]],
+            "event": self.names.values[self._name[row]],
+            "actual": values[self._actual[row]],
+            "forecast": values[self._forecast[row]],
+            "previous": values[self._previous[row]],
+        }
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("event row out of range")
+        return self.event(row)
+
+    def __iter__(self):
+        return (self.event(row) for row in range(len(self)))
+
+    def to_dicts(self, rows=None):
+        return [self.event(row) for row in (range(len(self)) if rows is None else rows)]
+
+    def series_rows(self, currency, event):
+        """Row numbers of one series in datetime order; [] for an unknown series."""
+        key = (self.currencies.id_of(currency), self.names.id_of(event))
+        rows = self._series.get(key)
+        if rows is None:
+            return []
+        return sorted(rows, key=lambda row: event_sort_key(self.datetime(row)))
+
+    def series(self, currency, event):
+        """The full history of one series, e.g. series("USD", "CPI m/m"), as event dicts in datetime order."""
+        return self.to_dicts(self.series_rows(currency, event))
+
+    def series_keys(self, currency=None):
+        """(currency, event name) of every series, optionally of one currency only, with their event counts."""
+        currency_id = None if currency is None else self.currencies.id_of(currency)
+        if currency is not None and currency_id is None:
+            return []
+        return sorted((self.currencies.values[c], self.names.values[n], len(rows))
+                      for (c, n), rows in self._series.items() if currency_id is None or c == currency_id)
+
+    def write_csv(self, path_or_file, rows=None):
+        """Writes EVENT_COLUMNS rows to a path (utf-8-sig, like the scraper output) or an open text file."""
+        if hasattr(path_or_file, "write"):
+            writer = csv.DictWriter(path_or_file, fieldnames=EVENT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.event(row) for row in (range(len(self)) if rows is None else rows))
+            return
+        with open(path_or_file, "w", newline="", encoding="utf-8-sig") as f:
+            self.write_csv(f, rows)
+
+    def nbytes(self):
+        """Approximate memory held by the table: columns, series index and interned strings."""
+        columns = sum(getattr(self, name).buffer_info()[1] * getattr(self, name).itemsize
+                      for name in ("_day", "_time", "_currency", "_impact", "_name",
+                                   "_actual", "_forecast", "_previous"))
+        index = sys.getsizeof(self._series) + sum(
+            sys.getsizeof(key) + sys.getsizeof(rows) for key, rows in self._series.items())
+        strings = sum(table.nbytes() for table in (self.currencies, self.impacts, self.names, self.times, self.values))
+        return columns + index + strings
+
+
+def _traced_bytes(build):
+    """(result, bytes allocated by build() that are still alive)."""
+    tracemalloc.start()
+    try:
+        result = build()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load a scraper CSV into the compact event table.")
+    parser.add_argument("csv_path", help="forex_factory_data_*.csv or a partition CSV")
+    parser.add_argument("--series", nargs=2, metavar=("CURRENCY", "EVENT"),
+                        help='Print one series\' history, e.g. --series USD "CPI m/m"')
+    parser.add_argument("--list", metavar="CURRENCY", help="List the series of one currency")
+    args = parser.parse_args(argv)
+
+    def load_dicts():
+        with open(args.csv_path, newline="", encoding="utf-8-sig") as f:
+            return list(csv.DictReader(f))
+
+    events, dict_bytes = _traced_bytes(load_dicts)
+    del events
+    started = time.perf_counter()
+    table, table_bytes = _traced_bytes(lambda: EventTable.from_csv(args.csv_path))
+    load_seconds = time.perf_counter() - started
+    count = max(1, len(table))
+    print(f"{len(table)} events, {len(table.series_keys())} series (loaded in {load_seconds:.2f}s)", file=sys.stderr)
+    print(f"dicts: {dict_bytes / count:.0f} B/event, compact: {table_bytes / count:.0f} B/event "
+          f"({dict_bytes / max(1, table_bytes):.1f}x smaller)", file=sys.stderr)
+
+    if args.list:
+        for currency, name, n in table.series_keys(args.list):
+            print(f"{currency:<4} {name:<50} {n:>6}")
+    if args.series:
+        started = time.perf_counter()
+        rows = table.series_rows(*args.series)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for ev in table.to_dicts(rows):
+            print(f"{ev['datetime']:<20} {ev['actual']:>10} {ev['forecast']:>10} {ev['previous']:>10}")
+        print(f"{len(rows)} events in {elapsed_ms:.2f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
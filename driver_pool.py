@@ -0,0 +1,147 @@
+"""
+A pool of long-lived Chrome drivers shared by the worker threads.
+
+Starting uc.Chrome, opening the calendar and dealing with the cookie banner
+takes several seconds, and setup_worker_driver serializes it behind a lock.
+The pool pays that cost once per browser instead of once per chunk: it warms
+`size` drivers up front and leases them to tasks. A driver is health-checked
+before each lease, and it is recycled (quit and replaced) after
+max_pages_per_driver pages or when the task reports a failure.
+"""
+import threading
+from contextlib import contextmanager
+
+
+class DriverPool:
+    def __init__(self, factory, size, max_pages_per_driver=200):
+        self.factory = factory
+        self.size = size
+        self.max_pages_per_driver = max_pages_per_driver
+        self._cond = threading.Condition()
+        self._idle = []
+        self._pages = {}  # id(driver) -> pages loaded by that driver
+        self._busy = 0
+        self._closed = False
+        self._stats = {"created": 0, "recycled": 0, "failed_setups": 0, "leases": 0}
+
+    def warm(self):
+        """Starts drivers until `size` are warm. Returns how many are available."""
+        while True:
+            with self._cond:
+                if self._closed or len(self._idle) + self._busy >= self.size:
+                    return len(self._idle)
+                self._busy += 1  # Reserve the slot while the browser starts
+            driver = self._create()
+            with self._cond:
+                self._busy -= 1
+                if driver is None:
+                    return len(self._idle)
+                self._idle.append(driver)
+                self._cond.notify()
+
+    def _create(self):
+        driver = self.factory()
+        with self._cond:
+            if driver is None:
+                self._stats["failed_setups"] += 1
+            else:
+                self._stats["created"] += 1
+                self._pages[id(driver)] = 0
+        return driver
+
+    @staticmethod
+    def is_healthy(driver):
+        try:
+            driver.execute_script("return document.readyState")
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, timeout=None):
+        """
+        Leases a healthy driver, starting a new one if the pool is below size.
+        Returns None if no driver could be started or the pool is closed.
+        """
+        while True:
+            with self._cond:
+                while not self._idle and len(self._idle) + self._busy >= self.size and not self._closed:
+                    if not self._cond.wait(timeout):
+                        return None
+                if self._closed:
+                    return None
+                driver = self._idle.pop() if self._idle else None
+                self._busy += 1
+            if driver is None:
+                driver = self._create()
+                if driver is None:
+                    self._release_slot()
+                    return None
+            elif not self.is_healthy(driver):
+                self._quit(driver)
+                self._release_slot()
+                continue
+            with self._cond:
+                self._stats["leases"] += 1
+            return driver
+
+    def release(self, driver, pages=0, failed=False):
+        """Returns a leased driver. Drivers that failed or reached the page budget are recycled."""
+        with self._cond:
+            self._pages[id(driver)] = self._pages.get(id(driver), 0) + pages
+            worn_out = self._pages[id(driver)] >= self.max_pages_per_driver
+        if failed or worn_out or self._closed:
+            self._quit(driver)
+        else:
+            with self._cond:
+                self._idle.append(driver)
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._cond:
+            self._busy -= 1
+            self._cond.notify()
+
+    def _quit(self, driver):
+        with self._cond:
+            self._pages.pop(id(driver), None)
+            if not self._closed:
+                self._stats["recycled"] += 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def lease(self, timeout=None):
+        """
+        with pool.lease() as lease: lease.driver ... ; lease.pages += 1 ; lease.failed = True
+        """
+        driver = self.acquire(timeout)
+        lease = DriverLease(driver)
+        try:
+            yield lease
+        except Exception:
+            lease.failed = True
+            raise
+        finally:
+            if driver is not None:
+                self.release(driver, lease.pages, lease.failed)
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, warm=len(self._idle), busy=self._busy, size=self.size)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for driver in idle:
+            self._quit(driver)
+
+
+class DriverLease:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.failed = False
@@ -0,0 +1,220 @@
+"""
+Local SQLite store of scraped events, with upserts and indexed queries.
+
+The store replaces standalone forex_factory_data_*.csv files as the place
+runs accumulate into. Overlapping runs create no duplicates: rows are keyed
+on the natural key (day, currency, event) plus seq, the event's position
+among same-named events of that currency on that day (e.g. two "FOMC Member
+Speaks"). Re-scraping a day updates revised actuals in place. Indexes on
+datetime, currency and impact keep range/currency/impact queries in the
+millisecond range.
+
+Command line:
+
+    python event_store.py --start 2019-01-01 --end 2019-12-31 --currency USD --impact High
+    python event_store.py --import forex_factory_data_20150101_to_20150331.csv
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+from calendar_parser import EVENT_COLUMNS, event_sort_key
+
+DEFAULT_STORE_PATH = "ff_events.sqlite"
+# PRAGMA user_version. 1: All Day events are "YYYY-mm-dd All Day"; 0 stored them at 00:00:00
+_STORE_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    day TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    event TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    datetime TEXT NOT NULL,
+    sort_key TEXT NOT NULL,
+    impact TEXT NOT NULL,
+    actual TEXT NOT NULL,
+    forecast TEXT NOT NULL,
+    previous TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (day, currency, event, seq)
+);
+CREATE INDEX IF NOT EXISTS events_datetime ON events(sort_key);
+CREATE INDEX IF NOT EXISTS events_currency ON events(currency, sort_key);
+CREATE INDEX IF NOT EXISTS events_impact ON events(impact, sort_key);
+"""
+
+# Only touch rows whose content changed, so updated_at says when a value was last revised
+_UPSERT = """
+INSERT INTO events (day, currency, event, seq, datetime, sort_key, impact, actual, forecast, previous, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (day, currency, event, seq) DO UPDATE SET
+    datetime = excluded.datetime, sort_key = excluded.sort_key, impact = excluded.impact,
+    actual = excluded.actual, forecast = excluded.forecast, previous = excluded.previous,
+    updated_at = excluded.updated_at
+WHERE (datetime, impact, actual, forecast, previous)
+    IS NOT (excluded.datetime, excluded.impact, excluded.actual, excluded.forecast, excluded.previous)
+"""
+
+
+def _event_rows(events, updated_at):
+    """
+    Store rows for events, numbering same-named events per (day, currency) by
+    time and then page order, which the sorted CSVs preserve too.
+    """
+    seen = {}
+    rows = []
+    for ev in sorted(events, key=lambda ev: event_sort_key(ev["datetime"])):
+        day = ev["datetime"][:10]
+        key = (day, ev["currency"], ev["event"])
+        seq = seen.get(key, 0)
+        seen[key] = seq + 1
+        rows.append((day, ev["currency"], ev["event"], seq, ev["datetime"], event_sort_key(ev["datetime"]),
+                     ev["impact"], ev["actual"], ev["forecast"], ev["previous"], updated_at))
+    return rows
+
+
+class EventStore:
+    """Thread-safe SQLite event store. Writers share one connection; readers can use other processes."""
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")  # Queries don't block a running scrape
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Respells All Day rows of a store written before they had their own label (see calendar_parser)."""
+        with self._lock, self._db:
+            if self._db.execute("PRAGMA user_version").fetchone()[0] >= _STORE_VERSION:
+                return
+            self._db.execute("UPDATE events SET datetime = day || ' All Day' WHERE datetime = day || ' 00:00:00'")
+            self._db.execute(f"PRAGMA user_version = {_STORE_VERSION}")
+
+    def upsert_events(self, events):
+        """Inserts new events and updates changed ones. Returns the number of rows written."""
+        rows = _event_rows(events, time.time())
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany(_UPSERT, rows)
+            return self._db.total_changes - before
+
+    def write_day(self, day, events):
+        """
+        Stores one fully fetched day: upserts its events and deletes stored
+        events of that day that are no longer on the page. Returns (written, deleted).
+        """
+        day_str = day.isoformat()
+        rows = _event_rows(events, time.time())
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany(_UPSERT, rows)
+            written = self._db.total_changes - before
+            stored = self._db.execute(
+                "SELECT currency, event, seq FROM events WHERE day = ?", (day_str,)).fetchall()
+            stale = set(stored) - {(row[1], row[2], row[3]) for row in rows}
+            self._db.executemany("DELETE FROM events WHERE day = ? AND currency = ? AND event = ? AND seq = ?",
+                                 [(day_str,) + key for key in stale])
+        return written, len(stale)
+
+    def query(self, start_date=None, end_date=None, currencies=None, impacts=None, event_like=None, limit=None):
+        """
+        Events in start_date..end_date (inclusive), optionally limited to some
+        currencies/impacts and to event names matching a LIKE pattern, in
+        chronological order. Returns dicts with the EVENT_COLUMNS keys.
+        """
+        clauses, params = [], []
+        if start_date is not None:
+            clauses.append("sort_key >= ?")
+            params.append(start_date.isoformat())
+        if end_date is not None:
+            clauses.append("sort_key < ?")
+            params.append((end_date + timedelta(days=1)).isoformat())
+        for column, values in (("currency", currencies), ("impact", impacts)):
+            if values:
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        if event_like:
+            clauses.append("event LIKE ?")
+            params.append(event_like)
+        sql = f"SELECT {', '.join(EVENT_COLUMNS)} FROM events"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY sort_key, day, rowid"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [dict(zip(EVENT_COLUMNS, row)) for row in rows]
+
+    def import_csv(self, path):
+        """Upserts the rows of a scraper CSV (e.g. an old forex_factory_data_*.csv). Returns rows written."""
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            return self.upsert_events(list(csv.DictReader(f)))
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _print_events(events, output_format):
+    if output_format == "jsonl":
+        for ev in events:
+            print(json.dumps(ev, ensure_ascii=False))
+    elif output_format == "csv":
+        writer = csv.DictWriter(sys.stdout, fieldnames=EVENT_COLUMNS, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(events)
+    else:
+        for ev in events:
+            print(f"{ev['datetime']:<20} {ev['currency']:<4} {ev['impact']:<16} {ev['event']:<45} "
+                  f"{ev['actual']:>10} {ev['forecast']:>10} {ev['previous']:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query or fill the local Forex Factory event store.")
+    parser.add_argument("--db", default=DEFAULT_STORE_PATH, help="Event store path")
+    parser.add_argument("--start", type=date.fromisoformat, help="First day, YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last day (inclusive), YYYY-MM-DD")
+    parser.add_argument("--currency", action="append", help="Currency code; repeat for several")
+    parser.add_argument("--impact", action="append", help="Impact (High, Medium, Low, Holiday...); repeat for several")
+    parser.add_argument("--event", help="Event name pattern, SQL LIKE syntax (e.g. '%%Payrolls%%')")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--format", choices=("table", "csv", "jsonl"), default="table")
+    parser.add_argument("--import", dest="import_paths", nargs="+", metavar="CSV",
+                        help="Upsert scraper CSVs into the store instead of querying")
+    args = parser.parse_args(argv)
+
+    store = EventStore(args.db)
+    try:
+        if args.import_paths:
+            for path in args.import_paths:
+                print(f"{path}: {store.import_csv(path)} rows written")
+            print(f"{store.count()} events in {args.db}")
+            return
+        started = time.perf_counter()
+        events = store.query(args.start, args.end, args.currency, args.impact, args.event, args.limit)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        _print_events(events, args.format)
+        print(f"{len(events)} events in {elapsed_ms:.1f} ms", file=sys.stderr)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Plans which calendar pages to load for a date range.
+
+Forex Factory serves the same calendar table for ?day=, ?week= and ?month=
+URLs, so a long range can be covered with one navigation per week or month
+instead of one per day. Every FetchUnit records the span its page shows
+(page_start/page_end) and the part of it that was actually requested
+(start/end); rows outside start..end are trimmed after parsing.
+"""
+import re
+from calendar import monthrange
+from collections import namedtuple
+from datetime import date, timedelta
+
+BASE_URL = "https://www.forexfactory.com/calendar"
+
+VIEWS = ("day", "week", "month", "auto")
+
+
+def day_url(target_date):
+    return f"{BASE_URL}?day={target_date.strftime('%b').lower()}{target_date.day}.{target_date.year}"
+
+
+def week_url(week_start):
+    return f"{BASE_URL}?week={week_start.strftime('%b').lower()}{week_start.day}.{week_start.year}"
+
+
+def month_url(month_start):
+    return f"{BASE_URL}?month={month_start.strftime('%b').lower()}.{month_start.year}"
+
+
+class FetchUnit(namedtuple("FetchUnit", "view page_start page_end start end")):
+    """One page load. start/end is the requested window inside page_start/page_end."""
+    __slots__ = ()
+
+    @property
+    def url(self):
+        if self.view == "day":
+            return day_url(self.page_start)
+        if self.view == "week":
+            return week_url(self.page_start)
+        return month_url(self.page_start)
+
+    def days(self):
+        current = self.start
+        while current <= self.end:
+            yield current
+            current += timedelta(days=1)
+
+    def __str__(self):
+        return f"{self.view} {self.start.isoformat()}..{self.end.isoformat()}"
+
+
+def week_start_for(target_date):
+    """Forex Factory weeks run Sunday to Saturday."""
+    return target_date - timedelta(days=(target_date.weekday() + 1) % 7)
+
+
+def _month_bounds(year, month):
+    return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+
+
+def _clip(view, page_start, page_end, start, end):
+    return FetchUnit(view, page_start, page_end, max(page_start, start), min(page_end, end))
+
+
+def _day_units(start, end):
+    current = start
+    while current <= end:
+        yield FetchUnit("day", current, current, current, current)
+        current += timedelta(days=1)
+
+
+def _week_units(start, end):
+    week_start = week_start_for(start)
+    while week_start <= end:
+        yield _clip("week", week_start, week_start + timedelta(days=6), start, end)
+        week_start += timedelta(days=7)
+
+
+def _month_units(start, end):
+    year, month = start.year, start.month
+    while date(year, month, 1) <= end:
+        month_start, month_end = _month_bounds(year, month)
+        yield _clip("month", month_start, month_end, start, end)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _auto_units(start, end):
+    """Months the range covers in full become month pages; the edges use whichever is fewer."""
+    units = []
+    for month_unit in _month_units(start, end):
+        full_month = (month_unit.start, month_unit.end) == (month_unit.page_start, month_unit.page_end)
+        if full_month:
+            units.append(month_unit)
+            continue
+        if month_unit.start == month_unit.end:
+            units.extend(_day_units(month_unit.start, month_unit.end))
+            continue
+        week_units = list(_week_units(month_unit.start, month_unit.end))
+        units.extend(week_units if len(week_units) <= 1 else [month_unit])
+    return _merge_shared_pages(units)
+
+
+def _merge_shared_pages(units):
+    """
+    Joins neighbouring units when one of their pages shows both requested
+    spans, e.g. the two month edges of a week that crosses a month boundary.
+    """
+    merged = []
+    for unit in units:
+        previous = merged[-1] if merged else None
+        page = next((candidate for candidate in (previous, unit) if previous is not None
+                     and candidate.page_start <= previous.start and unit.end <= candidate.page_end), None)
+        if page is None:
+            merged.append(unit)
+        else:
+            merged[-1] = FetchUnit(page.view, page.page_start, page.page_end, previous.start, unit.end)
+    return merged
+
+
+_URL_PATTERN = re.compile(r'[?&](day|week|month)=([a-z]{3})(\d{1,2})?\.(\d{4})$')
+_MONTH_ABBRS = ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec')
+
+
+def unit_from_url(url):
+    """Inverse of FetchUnit.url: returns the full-page FetchUnit for a calendar URL, or None."""
+    match = _URL_PATTERN.search(url)
+    if not match or match.group(2) not in _MONTH_ABBRS:
+        return None
+    view, month_abbr, day_num, year = match.groups()
+    month = _MONTH_ABBRS.index(month_abbr) + 1
+    try:
+        if view == "month":
+            page_start, page_end = _month_bounds(int(year), month)
+        elif day_num is None:
+            return None
+        else:
+            page_start = date(int(year), month, int(day_num))
+            page_end = page_start + timedelta(days=6) if view == "week" else page_start
+    except ValueError:
+        return None
+    return FetchUnit(view, page_start, page_end, page_start, page_end)
+
+
+def plan_fetches(start_date, end_date, view="auto"):
+    """Returns the FetchUnits covering start_date..end_date (inclusive) in date order."""
+    if start_date > end_date:
+        return []
+    if view == "day":
+        return list(_day_units(start_date, end_date))
+    if view == "week":
+        return list(_week_units(start_date, end_date))
+    if view == "month":
+        return list(_month_units(start_date, end_date))
+    if view == "auto":
+        return _auto_units(start_date, end_date)
+    raise ValueError(f"Unknown fetch view {view!r}, expected one of {VIEWS}")
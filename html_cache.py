@@ -0,0 +1,164 @@
+"""
+On-disk cache of raw calendar pages, and offline replay from it.
+
+Every page the scrapers load is stored gzip-compressed under the SHA-256 of
+its HTML (objects/ab/abcdef....html.gz), so identical pages are kept once. An
+SQLite index maps (url, fetched_on) to the blob. When the blobs grow past
+max_bytes, the least recently used ones are evicted.
+
+plan_replay and parse_replay_page rebuild events for a date range from the
+cache alone, with no browser, so parsing changes can be applied to years of
+pages in seconds.
+"""
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from calendar_parser import parse_calendar_page
+from fetch_planner import unit_from_url
+
+DEFAULT_CACHE_DIR = "ff_html_cache"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT NOT NULL,
+    fetched_on TEXT NOT NULL,
+    sha256 TEXT NOT NULL REFERENCES blobs(sha256),
+    PRIMARY KEY (url, fetched_on)
+);
+CREATE INDEX IF NOT EXISTS pages_sha256 ON pages(sha256);
+"""
+
+
+class HtmlCache:
+    """Thread-safe, content-addressed store of calendar page HTML."""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def _blob_path(self, sha256):
+        return os.path.join(self.root, "objects", sha256[:2], sha256 + ".html.gz")
+
+    def put(self, url, page_html, fetched_on=None):
+        """Stores page_html as fetched from url on fetched_on (default: today). Returns its hash."""
+        fetched_on = (fetched_on or date.today()).isoformat()
+        data = page_html.encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(sha256)
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            if row is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(gzip.compress(data, compresslevel=6))
+                os.replace(tmp_path, path)
+                self._db.execute("INSERT INTO blobs VALUES (?, ?, ?)", (sha256, os.path.getsize(path), time.time()))
+            else:
+                self._db.execute("UPDATE blobs SET last_access = ? WHERE sha256 = ?", (time.time(), sha256))
+            self._db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?)", (url, fetched_on, sha256))
+            self._db.commit()
+            self._evict_locked()
+        return sha256
+
+    def get(self, url, fetched_on=None):
+        """Returns the cached HTML for url (the latest fetch unless fetched_on is given), or None."""
+        with self._lock:
+            if fetched_on is None:
+                row = self._db.execute(
+                    "SELECT sha256 FROM pages WHERE url = ? ORDER BY fetched_on DESC LIMIT 1", (url,)).fetchone()
+            else:
+                row = self._db.execute(
+                    "SELECT sha256 FROM pages WHERE url = ? AND fetched_on = ?", (url, fetched_on.isoformat())).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE blobs SET last_access = ? WHERE sha256 = ?", (time.time(), row[0]))
+            self._db.commit()
+        return self.read_blob(row[0])
+
+    def read_blob(self, sha256):
+        try:
+            with open(self._blob_path(sha256), "rb") as f:
+                return gzip.decompress(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            return None
+
+    def latest_pages(self):
+        """Returns [(url, fetched_on, sha256)] with the most recent fetch of every cached URL."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url, MAX(fetched_on), sha256 FROM pages GROUP BY url ORDER BY url").fetchall()
+        return [(url, date.fromisoformat(fetched_on), sha256) for url, fetched_on, sha256 in rows]
+
+    def total_bytes(self):
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def _evict_locked(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% so we don't evict again on the very next put.
+        target = self.max_bytes * 0.9
+        for sha256, size in self._db.execute("SELECT sha256, size FROM blobs ORDER BY last_access").fetchall():
+            if total <= target:
+                break
+            self._db.execute("DELETE FROM pages WHERE sha256 = ?", (sha256,))
+            self._db.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+            try:
+                os.remove(self._blob_path(sha256))
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def plan_replay(cache, start_date, end_date):
+    """
+    Picks, for every day in start_date..end_date, the cached page that covers
+    it and was fetched most recently. Returns [(unit, sha256, days)] in date order.
+    """
+    best = {}
+    for url, fetched_on, sha256 in cache.latest_pages():
+        unit = unit_from_url(url)
+        if unit is None or unit.page_end < start_date or unit.page_start > end_date:
+            continue
+        for day in unit.days():
+            if start_date <= day <= end_date and (day not in best or fetched_on > best[day][0]):
+                best[day] = (fetched_on, url, unit, sha256)
+
+    by_page = {}
+    for day in sorted(best):
+        _, url, unit, sha256 = best[day]
+        by_page.setdefault(url, (unit, sha256, []))[2].append(day)
+    return sorted(by_page.values(), key=lambda page: page[2][0])
+
+
+def parse_replay_page(page, page_html):
+    """
+    Events of a cached page on the days plan_replay picked it for. page is
+    (unit, days); module level so a process pool can run it (see pipeline.py).
+    """
+    unit, days = page
+    wanted = {day.strftime('%Y-%m-%d') for day in days}
+    return [event for event in parse_calendar_page(page_html, unit.page_start, unit.page_end, window=(days[0], days[-1]))
+            if event["datetime"][:10] in wanted]
@@ -0,0 +1,179 @@
+"""
+HTTP fast path for calendar pages, using cookies harvested from the browser.
+
+A full Chrome navigation costs seconds and hundreds of MB per worker, even
+though the calendar table is in the HTML the server returns. Once a
+uc.Chrome session has passed Cloudflare, its cookies (cf_clearance and the
+site session) and user agent can be copied into a pooled keep-alive
+requests.Session. Most pages can then be fetched over plain HTTP and handed to
+the offline parser.
+
+HybridFetcher.fetch returns None whenever the browser has to take over:
+before the first harvest, on a Cloudflare challenge, on an error, or when
+the response has no calendar table. After a challenge the cookies are stale.
+The next page the browser loads successfully refreshes them (see
+note_browser_page). If challenges keep coming right after fresh cookies, the
+site is rejecting plain HTTP clients, and the fast path turns itself off.
+stats() reports the hit rate. Challenges are also counted in a
+metrics.Metrics when one is given.
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from calendar_parser import is_challenge_page
+from fetch_planner import BASE_URL
+from metrics import CLOUDFLARE_BLOCKS
+
+_NO_EVENTS_TEXT = "There are no news events scheduled"
+
+PAGE_OK = "ok"
+PAGE_CHALLENGE = "challenge"  # Cloudflare wants a browser
+PAGE_MISS = "miss"            # Anything else without a calendar, e.g. a 404 or an error page
+
+
+def classify_response(status_code, page_html):
+    """Sorts an HTTP response for a calendar URL into PAGE_OK, PAGE_CHALLENGE or PAGE_MISS."""
+    if status_code in (403, 429, 503) or is_challenge_page(page_html):
+        return PAGE_CHALLENGE
+    if status_code != 200 or ("calendar__table" not in page_html and _NO_EVENTS_TEXT not in page_html):
+        return PAGE_MISS
+    return PAGE_OK
+
+
+def rewrite_url(url, base_url):
+    """Points a calendar URL at base_url (e.g. a local stand-in server) instead of BASE_URL."""
+    if base_url and url.startswith(BASE_URL):
+        return base_url + url[len(BASE_URL):]
+    return url
+
+
+class HybridFetcher:
+    def __init__(self, pool_size=4, timeout=15, base_url=None, max_consecutive_challenges=3, metrics=None,
+                 rate_limiter=None):
+        """
+        base_url replaces BASE_URL in fetched URLs, e.g. "http://127.0.0.1:8765/calendar"
+        for a local stand-in server. rate_limiter (a rate_limiter.AdaptiveRateLimiter)
+        is slowed down on every challenge, before the page falls back to the browser.
+        """
+        self.timeout = timeout
+        self.base_url = base_url
+        self.max_consecutive_challenges = max_consecutive_challenges
+        self.metrics = metrics
+        self.rate_limiter = rate_limiter
+        self.enabled = True
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self._harvested = False
+        self._stale = False
+        self._consecutive_challenges = 0
+        self._stats = {"http": 0, "browser": 0, "challenges": 0, "misses": 0, "errors": 0, "harvests": 0}
+
+    @property
+    def ready(self):
+        """True when fetch() will try HTTP instead of returning None straight away."""
+        return self.enabled and self._harvested and not self._stale
+
+    def harvest(self, driver):
+        """Copies the browser session's cookies and user agent into the HTTP session."""
+        cookies = driver.get_cookies()
+        user_agent = driver.execute_script("return navigator.userAgent")
+        language = driver.execute_script("return navigator.language") or "en-US"
+        with self._lock:
+            self._session.cookies.clear()
+            for cookie in cookies:
+                # A local stand-in server has another host, so send the cookies to any host there
+                domain = cookie.get("domain", "") if self.base_url is None else ""
+                self._session.cookies.set(cookie["name"], cookie["value"], domain=domain,
+                                          path=cookie.get("path", "/"))
+            self._session.headers.update({
+                "User-Agent": user_agent,
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": f"{language},en;q=0.8",
+                "Referer": self._rewrite(BASE_URL),
+            })
+            self._harvested = True
+            self._stale = False
+            self._stats["harvests"] += 1
+
+    def export_session(self):
+        """Returns (cookies, headers) of the harvested session, e.g. for async_fetcher.AsyncFetchEngine."""
+        with self._lock:
+            return self._session.cookies.get_dict(), dict(self._session.headers)
+
+    def note_browser_page(self, driver):
+        """
+        Call after the browser loaded a page itself. Counts it, and
+        (re)harvests the cookies when there are none yet or they went stale.
+        """
+        with self._lock:
+            self._stats["browser"] += 1
+            needs_harvest = self.enabled and (not self._harvested or self._stale)
+        if needs_harvest:
+            try:
+                self.harvest(driver)
+            except Exception as e:
+                print(f"[HTTP] Could not harvest browser cookies: {e}")
+
+    def _rewrite(self, url):
+        return rewrite_url(url, self.base_url)
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def fetch(self, url):
+        """Returns the page HTML fetched over HTTP, or None if the browser has to load it."""
+        if not self.ready:
+            return None
+        try:
+            response = self._session.get(self._rewrite(url), timeout=self.timeout)
+            page_html = response.text
+        except requests.RequestException as e:
+            print(f"[HTTP] {url}: {e}")
+            self._count("errors")
+            return None
+
+        kind = classify_response(response.status_code, page_html)
+        if kind == PAGE_CHALLENGE:
+            if self.metrics is not None:
+                self.metrics.count(CLOUDFLARE_BLOCKS, url=url, source="http")
+            if self.rate_limiter is not None:
+                self.rate_limiter.on_throttle("Cloudflare challenge over HTTP")
+            with self._lock:
+                self._stats["challenges"] += 1
+                self._stale = True
+                self._consecutive_challenges += 1
+                if self._consecutive_challenges >= self.max_consecutive_challenges and self.enabled:
+                    self.enabled = False
+                    print(f"[HTTP] {self._consecutive_challenges} challenges in a row; "
+                          f"using the browser for every page from now on.")
+            return None
+        if kind == PAGE_MISS:
+            self._count("misses")
+            return None
+        with self._lock:
+            self._stats["http"] += 1
+            self._consecutive_challenges = 0
+        return page_html
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        pages = stats["http"] + stats["browser"]
+        stats["hit_rate"] = stats["http"] / pages if pages else 0.0
+        stats["enabled"] = self.enabled
+        return stats
+
+    def close(self):
+        self._session.close()
+
+
+def format_fetch_stats(stats):
+    return (f"[HTTP] {stats['http']} pages over HTTP, {stats['browser']} in the browser "
+            f"({stats['hit_rate']:.0%} hit rate); {stats['challenges']} challenges, {stats['misses']} misses, "
+            f"{stats['errors']} errors, {stats['harvests']} cookie harvests")
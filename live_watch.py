@@ -0,0 +1,297 @@
+"""
+Live watch mode: streams new and revised actuals for today's calendar.
+
+single_day_scrapper re-scrapes a whole day, scrolls and rewrites a CSV. The
+watcher keeps one warm browser instead. Its cookies let each read of today's page be a
+single HTTP request (http_fetcher.HybridFetcher). When Cloudflare wants a browser,
+the browser reloads the page itself. Every read is parsed offline and diffed
+against the previous snapshot, and only actuals that appeared or changed are
+emitted: as JSON lines on stdout, and to an on_change callback when the
+watcher is used from Python.
+
+Reads follow an adaptive schedule (PollSchedule): every `fast_interval`
+seconds from `lead` seconds before a scheduled event until its actual is
+out (or `follow` seconds have passed), otherwise at most every
+`idle_interval` seconds and never past the next event's lead window.
+
+    python live_watch.py                      # JSON lines on stdout, logs on stderr
+    python live_watch.py --fast 1 --idle 60 --emit-initial
+
+From Python:
+
+    watcher = LiveWatcher(load_page, on_change=lambda change: print(change["event"], change["actual"]))
+    watcher.run()
+"""
+import argparse
+import contextlib
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from calendar_parser import DEFAULT_SITE_TIMEZONE, parse_calendar_html
+from fetch_planner import day_url
+from page_ready import wait_for_calendar_ready, TIMEOUT
+
+DEFAULT_FAST_INTERVAL = 1.0
+DEFAULT_IDLE_INTERVAL = 60.0
+DEFAULT_LEAD_SECONDS = 30
+DEFAULT_FOLLOW_SECONDS = 300
+
+NEW_ACTUAL = "actual"     # An event's actual was published
+REVISED_ACTUAL = "revised"  # A published actual changed
+
+
+def log(message):
+    """Logs go to stderr so that stdout carries only the JSON lines."""
+    print(f"[Watch {datetime.now().strftime('%H:%M:%S')}] {message}", file=sys.stderr, flush=True)
+
+
+def snapshot_events(events):
+    """
+    {(currency, event, seq): event} for a parsed page. seq numbers same-named
+    events of a currency in page order (e.g. two "FOMC Member Speaks").
+    """
+    snapshot = {}
+    seen = {}
+    for ev in events:
+        name = (ev["currency"], ev["event"])
+        seq = seen.get(name, 0)
+        seen[name] = seq + 1
+        snapshot[name + (seq,)] = ev
+    return snapshot
+
+
+def scheduled_time(datetime_str):
+    """The naive site-local release time of a timed event, or None (All Day, Tentative, unparsed)."""
+    try:
+        return datetime.strptime(datetime_str, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def diff_actuals(previous, current, now_local=None):
+    """
+    Change records for actuals in `current` that are missing or different in
+    `previous` (both from snapshot_events). Actuals that disappear are ignored.
+    """
+    changes = []
+    detected_at = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+    for key, ev in current.items():
+        actual = ev["actual"]
+        old = previous.get(key)
+        old_actual = old["actual"] if old is not None else ""
+        if not actual or actual == old_actual:
+            continue
+        change = {"type": REVISED_ACTUAL if old_actual else NEW_ACTUAL, "datetime": ev["datetime"],
+                  "currency": ev["currency"], "impact": ev["impact"], "event": ev["event"], "seq": key[2],
+                  "actual": actual, "forecast": ev["forecast"], "previous": ev["previous"],
+                  "old_actual": old_actual or None, "detected_at": detected_at}
+        scheduled = scheduled_time(ev["datetime"])
+        if scheduled is not None and now_local is not None:
+            change["seconds_after_release"] = round((now_local - scheduled).total_seconds(), 1)
+        changes.append(change)
+    return changes
+
+
+class PollSchedule:
+    def __init__(self, fast_interval=DEFAULT_FAST_INTERVAL, idle_interval=DEFAULT_IDLE_INTERVAL,
+                 lead=DEFAULT_LEAD_SECONDS, follow=DEFAULT_FOLLOW_SECONDS):
+        self.fast_interval = fast_interval
+        self.idle_interval = idle_interval
+        self.lead = timedelta(seconds=lead)
+        self.follow = timedelta(seconds=follow)
+
+    def next_delay(self, events, now_local):
+        """
+        Seconds until the next read. Fast while a timed event without an actual
+        is inside its lead/follow window, otherwise idle, but waking up at the
+        next event's lead window.
+        """
+        next_window = None
+        for ev in events:
+            scheduled = scheduled_time(ev["datetime"])
+            if scheduled is None or ev["actual"]:
+                continue
+            if scheduled - self.lead <= now_local <= scheduled + self.follow:
+                return self.fast_interval
+            if scheduled - self.lead > now_local and (next_window is None or scheduled - self.lead < next_window):
+                next_window = scheduled - self.lead
+        delay = self.idle_interval
+        if next_window is not None:
+            delay = min(delay, (next_window - now_local).total_seconds())
+        return max(self.fast_interval, delay)
+
+
+class LiveWatcher:
+    def __init__(self, load_page, site_timezone=DEFAULT_SITE_TIMEZONE, on_change=None, schedule=None,
+                 emit_initial=False, day=None):
+        """
+        load_page(url) -> page HTML or None. on_change(change) is called for
+        every change record; the default writes JSON lines to stdout. The first
+        read is only a baseline unless emit_initial is set. day pins the
+        watched date instead of following today in site_timezone.
+        """
+        self.load_page = load_page
+        self.site_timezone = ZoneInfo(site_timezone)
+        self.on_change = on_change or emit_jsonl
+        self.schedule = schedule or PollSchedule()
+        self.fixed_day = day
+        self.day = None
+        self._snapshot = {} if emit_initial else None
+        self._events = []
+        self.stats = {"reads": 0, "failed_reads": 0, "changes": 0}
+
+    def now_local(self):
+        return datetime.now(self.site_timezone).replace(tzinfo=None)
+
+    def poll(self):
+        """Reads the page once and emits the changes. Returns the change records."""
+        now_local = self.now_local()
+        day = self.fixed_day or now_local.date()
+        if day != self.day:
+            if self.day is not None:
+                log(f"New day {day}; watching its page")
+                self._snapshot = {}  # Everything published on the new day is news
+            self.day = day
+            self._events = []
+
+        start = time.monotonic()
+        page_html = self.load_page(day_url(day))
+        self.stats["reads"] += 1
+        if page_html is None:
+            self.stats["failed_reads"] += 1
+            log(f"Could not read the calendar for {day}")
+            return []
+        events = parse_calendar_html(page_html, day)
+        current = snapshot_events(events)
+        if not current and self._events:
+            log("Read an empty table; keeping the previous snapshot")  # A half-rendered page, not a cleared day
+            return []
+        changes = [] if self._snapshot is None else diff_actuals(self._snapshot, current, self.now_local())
+        if self._snapshot is None:
+            log(f"Baseline for {day}: {len(events)} events, {sum(1 for ev in events if ev['actual'])} with actuals "
+                f"(read in {time.monotonic() - start:.2f}s)")
+        self._snapshot = current
+        self._events = events
+        for change in changes:
+            self.stats["changes"] += 1
+            try:
+                self.on_change(change)
+            except Exception as e:
+                log(f"on_change failed for {change['event']}: {e}")
+        return changes
+
+    def next_delay(self):
+        return self.schedule.next_delay(self._events, self.now_local())
+
+    def run(self, stop=None, max_polls=None):
+        """Polls until `stop` (a threading.Event) is set, or max_polls reads, or Ctrl-C."""
+        stop = stop or threading.Event()
+        polls = 0
+        try:
+            while not stop.is_set():
+                started = time.monotonic()
+                self.poll()
+                polls += 1
+                if max_polls is not None and polls >= max_polls:
+                    return
+                # The interval runs from the start of a read, so slow reads don't stretch it
+                stop.wait(max(0.0, self.next_delay() - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            pass
+
+
+def emit_jsonl(change, stream=None):
+    stream = stream or sys.stdout
+    stream.write(json.dumps(change) + "\n")
+    stream.flush()
+
+
+def browser_page_loader(driver, timeout=10):
+    """load_page that (re)loads the URL in the browser and snapshots page_source once the table is ready."""
+    def load_page(url):
+        try:
+            if driver.current_url == url:
+                driver.refresh()
+            else:
+                driver.get(url)
+            ready = wait_for_calendar_ready(driver, timeout=timeout, settle=0.2)
+            if ready.status == TIMEOUT and ready.rows == 0:
+                return None
+            return driver.page_source
+        except Exception as e:
+            log(f"Browser read failed: {e}")
+            return None
+
+    return load_page
+
+
+def hybrid_page_loader(driver, fetcher):
+    """load_page that reads over HTTP with the browser's cookies and lets the browser reload on a challenge."""
+    browser_load = browser_page_loader(driver)
+
+    def load_page(url):
+        page_html = fetcher.fetch(url)
+        if page_html is not None:
+            return page_html
+        page_html = browser_load(url)
+        if page_html is not None:
+            fetcher.note_browser_page(driver)  # Fresh cookies after a challenge
+        return page_html
+
+    return load_page
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stream new and revised actuals from today's calendar as JSON lines.")
+    parser.add_argument("--fast", type=float, default=DEFAULT_FAST_INTERVAL,
+                        help="Seconds between reads around scheduled events")
+    parser.add_argument("--idle", type=float, default=DEFAULT_IDLE_INTERVAL,
+                        help="Most seconds between reads when no release is due")
+    parser.add_argument("--lead", type=float, default=DEFAULT_LEAD_SECONDS,
+                        help="Start fast reads this many seconds before an event")
+    parser.add_argument("--follow", type=float, default=DEFAULT_FOLLOW_SECONDS,
+                        help="Keep fast reads up to this many seconds after an event without an actual")
+    parser.add_argument("--site-tz", default=DEFAULT_SITE_TIMEZONE, help="IANA timezone the calendar shows times in")
+    parser.add_argument("--emit-initial", action="store_true", help="Also emit actuals already on the first read")
+    parser.add_argument("--no-http", action="store_true", help="Reload the page in the browser for every read")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # The browser stack is only needed here, not by code that imports the watcher
+    from http_fetcher import HybridFetcher
+    from workets_scrapper import setup_worker_driver
+
+    with contextlib.redirect_stdout(sys.stderr):
+        driver = setup_worker_driver()
+    if driver is None:
+        log("Driver setup failed. Exiting.")
+        return 1
+    fetcher = None
+    try:
+        if args.no_http:
+            load_page = browser_page_loader(driver)
+        else:
+            fetcher = HybridFetcher(pool_size=1)
+            fetcher.harvest(driver)
+            load_page = hybrid_page_loader(driver, fetcher)
+        schedule = PollSchedule(args.fast, args.idle, args.lead, args.follow)
+        watcher = LiveWatcher(load_page, args.site_tz, schedule=schedule, emit_initial=args.emit_initial)
+        log(f"Watching today's calendar ({args.site_tz}); Ctrl-C to stop")
+        watcher.run()
+        log(f"{watcher.stats['reads']} reads ({watcher.stats['failed_reads']} failed), "
+            f"{watcher.stats['changes']} actuals emitted")
+    finally:
+        if fetcher is not None:
+            fetcher.close()
+        driver.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
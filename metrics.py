@@ -0,0 +1,226 @@
+"""
+Per-phase timings and counters for a scraping run.
+
+Every page goes through a few phases: starting a driver
+(setup_worker_driver), navigation (driver.get), the readiness wait, the
+scroll fallback, the HTTP fast path, parsing and writing. Metrics times
+each phase per worker and counts retries, timeouts, empty days and
+Cloudflare blocks, so worker counts and wait budgets can be tuned from data.
+Gauges hold the latest value of a measurement, e.g. a driver's memory.
+
+Exports:
+- JSON lines (`jsonl_path`): one line per observation and counter increment,
+  plus a "summary" line at every periodic export and at close.
+- Prometheus text format: to_prometheus(), write_prometheus(path) for the
+  node_exporter textfile collector, or serve_prometheus(port) for scraping.
+
+Percentiles are computed from the most recent `window` samples of each
+phase. Counts, sums and maximums cover the whole run.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+DEFAULT_METRICS_PATH = "ff_metrics.jsonl"
+
+# Counter names used by the scraper
+RETRIES = "retries"
+TIMEOUTS = "timeouts"
+EMPTY_DAYS = "empty_days"
+CLOUDFLARE_BLOCKS = "cloudflare_blocks"
+PAGES = "pages"
+FAILED_PAGES = "failed_pages"
+UNCHANGED_DAYS = "unchanged_days"
+BROWSER_FALLBACKS = "browser_fallbacks"
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class PhaseStats:
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def summary(self):
+        recent = sorted(self.recent)
+        summary = {"count": self.count, "sum": self.total, "max": self.max}
+        for q in QUANTILES:
+            summary[f"p{q * 100:g}"] = recent[min(len(recent) - 1, int(q * len(recent)))] if recent else None
+        return summary
+
+
+class Metrics:
+    def __init__(self, jsonl_path=None, window=10000):
+        self.window = window
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._phases = defaultdict(lambda: PhaseStats(window))         # phase -> stats
+        self._worker_phases = defaultdict(lambda: PhaseStats(window))  # (phase, worker) -> stats
+        self._counters = defaultdict(int)
+        self._gauges = defaultdict(dict)  # name -> {worker: latest value}
+        self._jsonl = open(jsonl_path, "a", encoding="utf-8") if jsonl_path else None
+        self.jsonl_path = jsonl_path
+
+    def _log(self, record):
+        if self._jsonl is None:
+            return  # Cheap early out; checked again under the lock, which close() takes
+        record = dict(record, ts=round(time.time(), 3))
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._jsonl is not None:
+                self._jsonl.write(line)
+
+    def observe(self, phase, seconds, worker=None, **fields):
+        """Records one duration of `phase`. Extra fields (e.g. url) only go to the JSON lines."""
+        with self._lock:
+            self._phases[phase].add(seconds)
+            if worker is not None:
+                self._worker_phases[(phase, str(worker))].add(seconds)
+        self._log(dict(type="phase", phase=phase, seconds=round(seconds, 6), worker=worker, **fields))
+
+    @contextmanager
+    def timer(self, phase, worker=None, **fields):
+        """with metrics.timer("driver.get", worker_id): ... records the block's duration, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start, worker, **fields)
+
+    def count(self, name, n=1, worker=None, **fields):
+        if not n:
+            return
+        with self._lock:
+            self._counters[name] += n
+        self._log(dict(type="count", name=name, n=n, worker=worker, **fields))
+
+    def gauge(self, name, value, worker=None, **fields):
+        """Sets the current value of `name` (per worker, if given)."""
+        with self._lock:
+            self._gauges[name][None if worker is None else str(worker)] = value
+        self._log(dict(type="gauge", name=name, value=value, worker=worker, **fields))
+
+    def snapshot(self):
+        """Phase summaries (overall and per worker) and counters as one dict."""
+        with self._lock:
+            workers = defaultdict(dict)
+            for (phase, worker), stats in self._worker_phases.items():
+                workers[worker][phase] = stats.summary()
+            return {
+                "elapsed": time.time() - self.started,
+                "phases": {phase: stats.summary() for phase, stats in self._phases.items()},
+                "workers": dict(workers),
+                "counters": dict(self._counters),
+                "gauges": {name: dict(values) for name, values in self._gauges.items()},
+            }
+
+    def log_summary(self):
+        """Appends a snapshot as a "summary" line and flushes the JSON lines file."""
+        self._log(dict(type="summary", **self.snapshot()))
+        if self._jsonl is not None:
+            with self._lock:
+                self._jsonl.flush()
+
+    def to_prometheus(self, prefix="ff_scraper"):
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {prefix}_phase_seconds summary"]
+        for label, phases in [(None, snapshot["phases"])] + sorted(snapshot["workers"].items()):
+            worker_label = f',worker="{label}"' if label is not None else ""
+            for phase, stats in sorted(phases.items()):
+                labels = f'phase="{phase}"{worker_label}'
+                for q in QUANTILES:
+                    value = stats[f"p{q * 100:g}"]
+                    if value is not None:
+                        lines.append(f'{prefix}_phase_seconds{{{labels},quantile="{q:g}"}} {value:.6f}')
+                lines.append(f"{prefix}_phase_seconds_sum{{{labels}}} {stats['sum']:.6f}")
+                lines.append(f"{prefix}_phase_seconds_count{{{labels}}} {stats['count']}")
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, values in sorted(snapshot["gauges"].items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            for worker, value in sorted(values.items(), key=lambda item: str(item[0])):
+                labels = f'{{worker="{worker}"}}' if worker is not None else ""
+                lines.append(f"{prefix}_{name}{labels} {value}")
+        lines.append(f"# TYPE {prefix}_elapsed_seconds gauge")
+        lines.append(f"{prefix}_elapsed_seconds {snapshot['elapsed']:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Writes to_prometheus() atomically, so a collector never reads a half-written file."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def serve_prometheus(self, port, host="127.0.0.1"):
+        """Serves to_prometheus() at http://host:port/metrics from a daemon thread. Returns the server."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Only needed with --prometheus-port
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        return server
+
+    def start_exporter(self, interval=30, prometheus_path=None):
+        """
+        Every `interval` seconds, logs a summary line and rewrites the
+        Prometheus file (if given) until the returned event is set.
+        """
+        stop = threading.Event()
+
+        def export():
+            while not stop.wait(interval):
+                self.log_summary()
+                if prometheus_path:
+                    self.write_prometheus(prometheus_path)
+
+        threading.Thread(target=export, name="metrics-exporter", daemon=True).start()
+        return stop
+
+    def close(self):
+        if self._jsonl is not None:
+            self.log_summary()
+            with self._lock:
+                self._jsonl.close()
+                self._jsonl = None
+
+
+def format_metrics(snapshot, phases=None):
+    """Table of phase percentiles and counters for the end-of-run report."""
+    lines = [f"{'phase':<22} {'count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'total s':>9}"]
+    for phase, stats in sorted(snapshot["phases"].items(), key=lambda item: -item[1]["sum"]):
+        if phases and phase not in phases:
+            continue
+        lines.append(f"{phase:<22} {stats['count']:>7} {stats['p50'] * 1000:>9.1f} {stats['p90'] * 1000:>9.1f} "
+                     f"{stats['p99'] * 1000:>9.1f} {stats['sum']:>9.1f}")
+    if snapshot["counters"]:
+        lines.append(", ".join(f"{name}: {value}" for name, value in sorted(snapshot["counters"].items())))
+    for name, values in sorted(snapshot["gauges"].items()):
+        lines.append(f"{name}: " + ", ".join(f"{value:g}" if worker is None else f"W{worker} {value:g}"
+                                             for worker, value in sorted(values.items(), key=lambda item: str(item[0]))))
+    return "\n".join(lines)
@@ -0,0 +1,128 @@
+"""
+Vectorized normalization of scraped events into typed columns.
+
+actual/forecast/previous are scraped as display strings ("215K", "-0.3%",
+"1.25B", "<0.1%"). normalize_events parses all three columns with a single
+regex pass each and adds:
+
+    actual_value, forecast_value, previous_value
+                   float64, with the K/M/B/T multiplier applied. Percentages
+                   stay in percentage points ("-0.3%" -> -0.3).
+    value_unit     the display unit ("%", "K", "M", "B", "T" or "") of the
+                   first of actual/forecast/previous that has one, as a category
+    value_bound    "<" or ">" when the actual was only reported as a bound, as a category
+    surprise       actual_value - forecast_value, NaN if their units differ or
+                   either of them is only a bound ("<0.1%" is not 0.1)
+
+impact and currency become categorical dtypes. Unparseable values become NaN,
+and the original string columns are kept unchanged.
+
+normalize_datetimes does the same for the datetime strings, which mix
+"YYYY-mm-dd HH:MM:SS" (site-local time), "YYYY-mm-dd All Day",
+"YYYY-mm-dd Tentative" and "YYYY-mm-dd <raw time text>". It adds:
+
+    time_kind      "timed", "all_day", "tentative" or "unscheduled", as a category,
+                   from the time text (a 12:00am release is timed)
+    datetime_utc   tz-aware UTC timestamp of timed events (NaT otherwise),
+                   converted from the timezone the site displayed times in
+    sort_key       int64 nanoseconds since the epoch (UTC). Untimed events sort
+                   at the start of their local day, and rows without a date last,
+                   matching calendar_parser.event_sort_key.
+"""
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from calendar_parser import DEFAULT_SITE_TIMEZONE
+
+VALUE_COLUMNS = ("actual", "forecast", "previous")
+TIME_KINDS = ["timed", "all_day", "tentative", "unscheduled"]
+UNIT_MULTIPLIERS = {"": 1.0, "%": 1.0, "K": 1e3, "M": 1e6, "B": 1e9, "T": 1e12}
+
+_VALUE_PATTERN = r'^\s*(?P<bound>[<>]?)\s*(?P<number>[-+]?(?:\d+\.?\d*|\.\d+))\s*(?P<unit>[KMBT%]?)\s*$'
+
+
+def _parse_value_column(values):
+    parts = values.astype("string").str.replace(",", "", regex=False).str.extract(_VALUE_PATTERN)
+    number = pd.to_numeric(parts["number"], errors="coerce")
+    multiplier = parts["unit"].map(UNIT_MULTIPLIERS)
+    unit = parts["unit"].where(number.notna())
+    bound = parts["bound"].where(number.notna() & (parts["bound"] != ""))
+    return (number * multiplier).astype("float64"), unit, bound
+
+
+def normalize_datetimes(df, site_timezone=DEFAULT_SITE_TIMEZONE):
+    """
+    Adds time_kind, datetime_utc and sort_key to df in place (see module
+    docstring). A decade has only tens of thousands of distinct datetime
+    strings, so each distinct string is parsed once and the results are
+    broadcast back to the rows.
+    """
+    codes, uniques = pd.factorize(df["datetime"].astype(str))
+    uniques = pd.Series(uniques, dtype=str)
+    stamp = pd.to_datetime(uniques, format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    day = pd.to_datetime(uniques.str.slice(0, 10), format="%Y-%m-%d", errors="coerce")
+    time_text = uniques.str.slice(11)
+    kind = np.select(
+        [stamp.notna().to_numpy(), (time_text == "All Day").to_numpy(), (time_text == "Tentative").to_numpy()],
+        ["timed", "all_day", "tentative"], default="unscheduled")
+    # Ambiguous wall times in the autumn DST change are taken as the first (DST) occurrence
+    local = stamp.fillna(day).dt.tz_localize(
+        site_timezone, ambiguous=np.ones(len(uniques), dtype=bool), nonexistent="shift_forward")
+    utc = local.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy("datetime64[ns]")
+    sort_key = utc.view("int64").copy()
+    sort_key[day.isna().to_numpy()] = np.iinfo(np.int64).max
+    utc[kind != "timed"] = np.datetime64("NaT")
+    kinds = pd.Categorical(kind, categories=TIME_KINDS)
+    df["time_kind"] = pd.Categorical.from_codes(kinds.codes[codes], categories=TIME_KINDS)
+    df["datetime_utc"] = pd.Series(utc[codes], index=df.index).dt.tz_localize("UTC")
+    df["sort_key"] = sort_key[codes]
+    return df
+
+
+def sort_events(df):
+    """Chronological order by sort_key. Stable, so events at the same time keep their page order."""
+    return df.sort_values("sort_key", kind="stable", ignore_index=True)
+
+
+def normalize_events(df, site_timezone=DEFAULT_SITE_TIMEZONE):
+    """Returns a copy of df with the typed columns added (see module docstring)."""
+    df = df.copy()
+    normalize_datetimes(df, site_timezone)
+    units = {}
+    bounds = {}
+    for column in VALUE_COLUMNS:
+        value, units[column], bounds[column] = _parse_value_column(df[column])
+        df[f"{column}_value"] = value
+    unit = units["actual"].fillna(units["forecast"]).fillna(units["previous"])
+    df["value_unit"] = unit.fillna("").astype("category")
+    df["value_bound"] = bounds["actual"].astype("category")
+    same_unit = (units["actual"] == units["forecast"]).fillna(False).astype(bool)
+    exact = (bounds["actual"].isna() & bounds["forecast"].isna()).to_numpy()
+    df["surprise"] = (df["actual_value"] - df["forecast_value"]).where(same_unit & exact)
+    df["impact"] = df["impact"].astype("category")
+    df["currency"] = df["currency"].astype("category")
+    return df
+
+
+def load_events(path, site_timezone=DEFAULT_SITE_TIMEZONE):
+    """
+    Loads a merged CSV, a Parquet file or a partitioned output directory and
+    returns the normalized DataFrame in chronological order. Parquet written
+    by the scraper is already normalized.
+    """
+    if path.endswith(".csv"):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+        return sort_events(normalize_events(df, site_timezone))
+    if os.path.isdir(path):
+        paths = sorted(glob.glob(os.path.join(path, "year=*", "month=*", "events.parquet")))
+        df = pd.concat([pd.read_parquet(p) for p in paths], ignore_index=True)
+        for column in ("currency", "impact", "value_unit", "value_bound", "time_kind"):
+            df[column] = df[column].astype("category")  # concat drops mismatched categories
+    else:
+        df = pd.read_parquet(path)
+    if "sort_key" not in df.columns:
+        df = normalize_events(df, site_timezone)
+    return sort_events(df)
@@ -0,0 +1,94 @@
+"""
+Event-driven readiness check for calendar pages.
+
+scroll_to_bottom sleeps 1.5-2s per scroll and needs two unchanged heights
+before it gives up, so every page paid 3-4s even when the table was complete
+on first paint. wait_for_calendar_ready instead runs one async script in the
+page: a MutationObserver records the last DOM change, and the script returns
+as soon as the document is loaded and the DOM has been quiet for `settle`
+seconds. If the table has rows by then, the page is complete and needs no
+scrolling. A hard timeout bounds the wait.
+
+If the browser can't run async scripts, it falls back to polling the row
+count, which costs one cheap execute_script call per poll.
+"""
+import time
+from collections import namedtuple
+
+READY = "ready"      # Table rendered and DOM quiet
+EMPTY = "empty"      # "There are no news events scheduled" page
+TIMEOUT = "timeout"  # Neither happened within the timeout
+
+ReadyResult = namedtuple("ReadyResult", "status rows waited")
+
+_ASYNC_READY_SCRIPT = """
+var settleMs = arguments[0], timeoutMs = arguments[1], done = arguments[arguments.length - 1];
+var start = Date.now(), lastChange = Date.now();
+function rowCount() { return document.querySelectorAll('table.calendar__table tr.calendar__row').length; }
+function noEvents() {
+    return !!document.body && document.body.innerText.indexOf('There are no news events scheduled') !== -1;
+}
+var observer = new MutationObserver(function () { lastChange = Date.now(); });
+observer.observe(document.documentElement, {childList: true, subtree: true});
+(function check() {
+    var now = Date.now(), rows = rowCount(), status = null;
+    if (document.readyState === 'complete' && now - lastChange >= settleMs) {
+        if (rows > 0) { status = 'ready'; } else if (noEvents()) { status = 'empty'; }
+    }
+    if (!status && now - start >= timeoutMs) { status = 'timeout'; }
+    if (status) { observer.disconnect(); done([status, rows, now - start]); }
+    else { setTimeout(check, 50); }
+})();
+"""
+
+_POLL_SCRIPT = """
+var rows = document.querySelectorAll('table.calendar__table tr.calendar__row').length;
+var noEvents = rows === 0 && !!document.body &&
+    document.body.innerText.indexOf('There are no news events scheduled') !== -1;
+return [document.readyState, rows, document.body ? document.body.scrollHeight : 0, noEvents];
+"""
+
+
+def _wait_async(driver, timeout, settle):
+    driver.set_script_timeout(timeout + 5)
+    status, rows, waited_ms = driver.execute_async_script(_ASYNC_READY_SCRIPT, int(settle * 1000), int(timeout * 1000))
+    return ReadyResult(status, rows, waited_ms / 1000.0)
+
+
+def _wait_polling(driver, timeout, settle, poll_interval):
+    start = time.monotonic()
+    last_seen = None
+    stable_since = start
+    while True:
+        now = time.monotonic()
+        ready_state, rows, height, no_events = driver.execute_script(_POLL_SCRIPT)
+        if (ready_state, rows, height) != last_seen:
+            last_seen = (ready_state, rows, height)
+            stable_since = now
+        elif ready_state == "complete" and now - stable_since >= settle:
+            if rows > 0:
+                return ReadyResult(READY, rows, now - start)
+            if no_events:
+                return ReadyResult(EMPTY, rows, now - start)
+        if now - start >= timeout:
+            return ReadyResult(TIMEOUT, rows, now - start)
+        time.sleep(poll_interval)
+
+
+def wait_for_calendar_ready(driver, timeout=15, settle=0.3, poll_interval=0.1):
+    """
+    Blocks until the calendar table is fully rendered, the page says there
+    are no events, or `timeout` seconds pass. Returns ReadyResult(status, rows, waited).
+    Prints nothing: callers time the wait through their metrics (the "wait" phase).
+    """
+    start = time.monotonic()
+    try:
+        result = _wait_async(driver, timeout, settle)
+    except Exception:
+        remaining = timeout - (time.monotonic() - start)
+        if remaining > 0:
+            result = _wait_polling(driver, remaining, settle, poll_interval)
+            result = result._replace(waited=time.monotonic() - start)
+        else:
+            result = ReadyResult(TIMEOUT, 0, time.monotonic() - start)
+    return result
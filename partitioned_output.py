@@ -0,0 +1,170 @@
+"""
+Streams scraped events to disk, partitioned by year and month.
+
+Rows are appended to <root>/year=YYYY/month=MM/events.csv as soon as each
+day is finished, so nothing has to wait for the end of the run and memory
+stays flat. finalize() then:
+
+  1. sorts each month partition (one month easily fits in memory) in place,
+     using the vectorized timestamp stage in normalize.py,
+  2. writes a Parquet file next to it when pyarrow is installed, with typed
+     value/unit/surprise columns, a UTC timestamp and sort key, and
+     categorical impact/currency, and
+  3. builds the merged CSV by streaming a k-way merge (heapq.merge) over the
+     already-sorted partitions, instead of sorting the whole dataset at once.
+"""
+import csv
+import glob
+import heapq
+import os
+import shutil
+import threading
+
+from calendar_parser import EVENT_COLUMNS, event_sort_key, migrate_legacy_all_day
+
+DEFAULT_OUTPUT_DIR = "ff_output"
+DEFAULT_FORMATS = ("csv", "parquet")
+# 2: All Day rows are "YYYY-mm-dd All Day". Partitions without the marker file are
+# version 1, which stored them at 00:00:00, and are migrated when opened.
+PARTITION_VERSION = 2
+VERSION_FILE = "partition_version"
+
+
+class PartitionedWriter:
+    def __init__(self, root=DEFAULT_OUTPUT_DIR, formats=DEFAULT_FORMATS, reset=False, site_timezone=None):
+        self.root = root
+        self.formats = tuple(formats)
+        self.site_timezone = site_timezone  # None: normalize.DEFAULT_SITE_TIMEZONE
+        self._lock = threading.Lock()
+        if reset and os.path.isdir(root):
+            shutil.rmtree(root)
+        os.makedirs(root, exist_ok=True)
+        self._migrate()
+
+    def _migrate(self):
+        """Brings partitions left by an older version (e.g. before a --resume) to PARTITION_VERSION."""
+        version_path = os.path.join(self.root, VERSION_FILE)
+        if os.path.exists(version_path):
+            return
+        for path in self.partition_paths():
+            tmp_path = path + ".tmp"
+            with open(path, newline="", encoding="utf-8") as src, \
+                    open(tmp_path, "w", newline="", encoding="utf-8") as dst:
+                writer = csv.DictWriter(dst, fieldnames=EVENT_COLUMNS)
+                writer.writeheader()
+                for row in csv.DictReader(src):
+                    row["datetime"] = migrate_legacy_all_day(row["datetime"])
+                    writer.writerow(row)
+            os.replace(tmp_path, path)
+        with open(version_path, "w", encoding="utf-8") as f:
+            f.write(f"{PARTITION_VERSION}\n")
+
+    def partition_dir(self, year, month):
+        return os.path.join(self.root, f"year={year:04d}", f"month={month:02d}")
+
+    def write_day(self, day, events, replace=False):
+        """
+        Appends one finished day's events to its month partition. With
+        replace, rows the partition already has for that day are dropped
+        first: a resumed or refreshing run passes it for every day it fetches
+        again, so a day never ends up with two copies of its rows.
+        """
+        path = os.path.join(self.partition_dir(day.year, day.month), "events.csv")
+        if replace and os.path.exists(path):
+            self._drop_day(path, day)
+        if not events:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            is_new = not os.path.exists(path)
+            with open(path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=EVENT_COLUMNS)
+                if is_new:
+                    writer.writeheader()
+                writer.writerows(events)
+
+    def _drop_day(self, path, day):
+        day_str = day.isoformat()
+        tmp_path = path + ".tmp"
+        with self._lock:
+            with open(path, newline="", encoding="utf-8") as src, \
+                    open(tmp_path, "w", newline="", encoding="utf-8") as dst:
+                writer = csv.DictWriter(dst, fieldnames=EVENT_COLUMNS)
+                writer.writeheader()
+                writer.writerows(row for row in csv.DictReader(src) if row["datetime"][:10] != day_str)
+            os.replace(tmp_path, path)
+
+    def partition_paths(self, start_date=None, end_date=None):
+        """Month partition CSVs in chronological order, optionally limited to a date range."""
+        paths = sorted(glob.glob(os.path.join(self.root, "year=*", "month=*", "events.csv")))
+        if start_date is None:
+            return paths
+        selected = []
+        for path in paths:
+            month_dir = os.path.dirname(path)
+            year = int(os.path.basename(os.path.dirname(month_dir))[len("year="):])
+            month = int(os.path.basename(month_dir)[len("month="):])
+            if (start_date.year, start_date.month) <= (year, month) <= (end_date.year, end_date.month):
+                selected.append(path)
+        return selected
+
+    def sort_partition(self, path):
+        """
+        Sorts a partition in place and returns it as a normalized DataFrame
+        (see normalize.py). Sorting uses the vectorized UTC sort_key instead
+        of a per-row key. Rows are kept as written, including identical ones
+        (two releases can share every column): a day fetched again already
+        replaced its old rows in write_day.
+        """
+        import pandas as pd
+        from normalize import DEFAULT_SITE_TIMEZONE, normalize_events, sort_events
+
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        df = sort_events(normalize_events(df, self.site_timezone or DEFAULT_SITE_TIMEZONE))
+        tmp_path = path + ".tmp"
+        df.to_csv(tmp_path, columns=EVENT_COLUMNS, index=False, encoding="utf-8")
+        os.replace(tmp_path, path)
+        return df
+
+    def write_parquet(self, path, df):
+        """Writes the normalized partition as Parquet next to its CSV."""
+        try:
+            import pyarrow  # noqa: F401  (pandas needs it for to_parquet)
+        except ImportError:
+            return False
+        df.to_parquet(os.path.join(os.path.dirname(path), "events.parquet"), index=False)
+        return True
+
+    def finalize(self, merged_path, start_date=None, end_date=None):
+        """Sorts every partition, writes Parquet copies and the merged CSV. Returns the row count."""
+        paths = self.partition_paths(start_date, end_date)
+        parquet_written = 0
+        for path in paths:
+            df = self.sort_partition(path)
+            if "parquet" in self.formats and self.write_parquet(path, df):
+                parquet_written += 1
+        if "parquet" in self.formats and paths and not parquet_written:
+            print("Parquet output skipped: install pyarrow to enable it.")
+        return merge_sorted_partitions(paths, merged_path, start_date, end_date)
+
+
+def _read_rows(path, start_str, end_str):
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if start_str is None or start_str <= row["datetime"][:10] <= end_str:
+                yield row
+
+
+def merge_sorted_partitions(paths, merged_path, start_date=None, end_date=None):
+    """Streams a merge of sorted partition CSVs into one CSV (utf-8-sig, like the old output)."""
+    start_str = start_date.isoformat() if start_date else None
+    end_str = end_date.isoformat() if end_date else None
+    streams = [_read_rows(path, start_str, end_str) for path in paths]
+    count = 0
+    with open(merged_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=EVENT_COLUMNS)
+        writer.writeheader()
+        for row in heapq.merge(*streams, key=lambda row: event_sort_key(row["datetime"])):
+            writer.writerow(row)
+            count += 1
+    return count
@@ -0,0 +1,143 @@
+"""
+Staged fetch -> parse -> write pipeline.
+
+When fetchers also parse and write, lxml parsing runs on the fetch threads,
+and every stage shares one GIL. The stages here are separated by bounded queues:
+
+    fetchers --put()--> [fetched queue] --> parse feeders --> process pool
+                                                                   |
+                       single writer <-- [parsed queue] <----------+
+
+- Fetchers (browser workers, the async engine, cache reads) only produce raw
+  HTML and call put(). put() blocks while the fetched queue is full.
+- Parse feeder threads hand pages to a ProcessPoolExecutor, one page each, so
+  `parse_workers` pages are parsed at once on separate cores. A feeder blocks
+  while the parsed queue is full.
+- One writer thread calls write_fn for every page in the order pages finish,
+  so output, event store and checkpoint need no extra locking.
+
+A slow stage fills the queue in front of it and stalls the stage before it
+(backpressure), so memory stays bounded. depths() shows where pages pile up.
+With parse_workers=0, pages are parsed on the feeder thread (no processes),
+which is easier to debug. With a metrics.Metrics, the "parse" phase records
+each page's time in the parse stage (including the hand-off to the pool).
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from calendar_parser import parse_fetch_unit
+
+_DONE = object()
+
+
+def parse_unit_page(unit, page_html):
+    """parse_fn for pages keyed by their fetch_planner.FetchUnit."""
+    return parse_fetch_unit(page_html, unit)
+
+
+class StagedPipeline:
+    def __init__(self, parse_fn, write_fn, parse_workers=None, fetched_queue_size=32, parsed_queue_size=32,
+                 metrics=None):
+        """
+        parse_fn(key, page_html) -> events runs in the process pool, so it must
+        be a picklable module-level function. write_fn(key, events, error) runs
+        on the writer thread; events is None when fetching or parsing failed.
+        """
+        self.parse_fn = parse_fn
+        self.write_fn = write_fn
+        self.metrics = metrics
+        self.parse_workers = (os.cpu_count() or 1) if parse_workers is None else parse_workers
+        self._fetched = queue.Queue(maxsize=fetched_queue_size)
+        self._parsed = queue.Queue(maxsize=parsed_queue_size)
+        self._executor = None
+        if self.parse_workers:
+            # spawn: forking a process that already runs threads (drivers, reporter) can deadlock the child
+            self._executor = ProcessPoolExecutor(self.parse_workers, mp_context=multiprocessing.get_context("spawn"))
+        feeders = self.parse_workers or 1
+        self._lock = threading.Lock()
+        self._parsing = 0
+        self._counts = {"fetched": 0, "parsed": 0, "written": 0, "failed": 0}
+        self._feeders = [threading.Thread(target=self._feed, name=f"parse-feeder-{i}", daemon=True)
+                         for i in range(feeders)]
+        self._writer = threading.Thread(target=self._write, name="pipeline-writer", daemon=True)
+        for thread in self._feeders + [self._writer]:
+            thread.start()
+
+    def put(self, key, page_html, error=None):
+        """Hands a fetched page (or a fetch failure: page_html None) to the parse stage. Blocks when it is full."""
+        with self._lock:
+            self._counts["fetched"] += 1
+        self._fetched.put((key, page_html, error))
+
+    def _feed(self):
+        while True:
+            item = self._fetched.get()
+            if item is _DONE:
+                return
+            key, page_html, error = item
+            events = None
+            if page_html is not None:
+                with self._lock:
+                    self._parsing += 1
+                start = time.perf_counter()
+                try:
+                    if self._executor is not None:
+                        events = self._executor.submit(self.parse_fn, key, page_html).result()
+                    else:
+                        events = self.parse_fn(key, page_html)
+                except Exception as e:
+                    error = f"parse failed: {e}"
+                finally:
+                    with self._lock:
+                        self._parsing -= 1
+                        self._counts["parsed"] += 1
+                    if self.metrics is not None:
+                        self.metrics.observe("parse", time.perf_counter() - start)
+            self._parsed.put((key, events, error))
+
+    def _write(self):
+        while True:
+            item = self._parsed.get()
+            if item is _DONE:
+                return
+            key, events, error = item
+            try:
+                self.write_fn(key, events, error if events is None else None)
+            except Exception as e:
+                print(f"[Pipeline] Could not write {key}: {e}")
+            with self._lock:
+                self._counts["written"] += 1
+                if events is None:
+                    self._counts["failed"] += 1
+
+    def depths(self):
+        """Pages waiting in or passing through each stage, plus running totals."""
+        with self._lock:
+            return dict(self._counts, fetched_queue=self._fetched.qsize(), parsing=self._parsing,
+                        parsed_queue=self._parsed.qsize())
+
+    def close(self):
+        """Waits until every page put so far is written, then stops the stages."""
+        for _ in self._feeders:
+            self._fetched.put(_DONE)
+        for thread in self._feeders:
+            thread.join()
+        self._parsed.put(_DONE)
+        self._writer.join()
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def format_depths(depths):
+    return (f"pipeline: {depths['fetched_queue']} fetched > {depths['parsing']} parsing > "
+            f"{depths['parsed_queue']} parsed > {depths['written']} written")
@@ -0,0 +1,78 @@
+"""
+Request pacing shared by every worker thread.
+
+The old fixed time.sleep per page ran in each thread, so the request rate
+grew with NUM_WORKERS and never went up when the site was responsive.
+TokenBucket enforces one global pages-per-second rate. AdaptiveRateLimiter
+adjusts that rate AIMD-style, like TCP congestion control: every healthy
+page adds a little rate (additive increase, capped at max_rate), and every
+timeout or Cloudflare challenge halves it (multiplicative decrease, floored
+at min_rate). Rate changes are logged.
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes one token, even if it has to be waited for, and returns how many
+        seconds the caller must wait before its request. For callers that can't
+        block, e.g. asyncio code (await asyncio.sleep(bucket.reserve())).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self):
+        """Blocks until the caller may make one request. Returns the seconds waited."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    def __init__(self, max_rate, min_rate=None, initial_rate=None, increase=None, decrease_factor=0.5,
+                 log_interval=30):
+        self.max_rate = float(max_rate)
+        self.min_rate = float(min_rate) if min_rate is not None else self.max_rate / 20
+        self.increase = float(increase) if increase is not None else self.max_rate / 20
+        self.decrease_factor = decrease_factor
+        self.log_interval = log_interval
+        self._last_log = 0.0
+        self.stats = {"ok": 0, "throttled": 0}
+        super().__init__(initial_rate if initial_rate is not None else self.max_rate / 2)
+
+    def _set_rate(self, rate_fn, stat, reason, force_log):
+        with self._lock:
+            self.stats[stat] += 1
+            old_rate = self.rate
+            new_rate = rate_fn(old_rate)
+            # Settle the tokens earned at the old rate before switching
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self.rate = new_rate
+            should_log = force_log or now - self._last_log >= self.log_interval
+            if should_log and new_rate != old_rate:
+                self._last_log = now
+        if should_log and new_rate != old_rate:
+            print(f"[RateLimiter] {old_rate:.2f} -> {new_rate:.2f} pages/s ({reason})")
+
+    def on_success(self):
+        self._set_rate(lambda rate: min(self.max_rate, rate + self.increase), "ok", "healthy", force_log=False)
+
+    def on_throttle(self, reason="throttled"):
+        self._set_rate(lambda rate: max(self.min_rate, rate * self.decrease_factor), "throttled", reason,
+                       force_log=True)
@@ -1,13 +1,19 @@
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import pandas as pd
+import argparse
 import time
-from datetime import datetime, timedelta, date
+from datetime import timedelta, date
 import os # For user_data_dir example
 
+from calendar_parser import parse_calendar_html
+from rate_limiter import TokenBucket
+from partitioned_output import PartitionedWriter, DEFAULT_OUTPUT_DIR
+from event_store import EventStore, DEFAULT_STORE_PATH
+from page_ready import wait_for_calendar_ready, EMPTY, TIMEOUT
+
 def setup_driver():
+    # Imported here so that importing this module doesn't load the browser stack
+    import undetected_chromedriver as uc
+    from selenium.webdriver.common.by import By
+
     options = uc.ChromeOptions()
     options.add_argument('--no-first-run')
     options.add_argument('--no-service-autorun')
@@ -68,178 +74,83 @@ def scroll_to_bottom(driver):
         last_height = new_height
     print("Finished scrolling.")
 
-def parse_impact(impact_cell_element):
-    try:
-        # The impact icon is usually within a <span> inside the <td>
-        span = impact_cell_element.find_element(By.TAG_NAME, "span")
-        title = span.get_attribute("title").lower() # Convert to lowercase for easier matching
-
-        if "non-economic" in title or "holiday" in title: # Handle bank holiday (grey icon)
-            return "Holiday"
-        elif "low impact expected" in title:
-            return "Low"
-        elif "medium impact expected" in title:
-            return "Medium"
-        elif "high impact expected" in title:
-            return "High"
-        return "Unknown Impact Title: " + title # If title exists but not matched
-    except:
-        # This means the <td> for impact was found, but no <span> or no title, or cell was empty
-        return "N/A"
-
 def scrape_day_data(driver, target_date_obj):
     url = generate_url_for_date(target_date_obj)
     print(f"Scraping data for {target_date_obj.strftime('%Y-%m-%d')} from {url}")
     driver.get(url)
 
+    ready = wait_for_calendar_ready(driver, timeout=20)
+    if ready.status == EMPTY:
+        print("No news events scheduled for this day.")
+        return []
+    if ready.status == TIMEOUT:
+        if ready.rows == 0:
+            print(f"Timeout waiting for calendar table rows on {url}")
+            return []
+        scroll_to_bottom(driver) # Rows were still arriving when the wait ran out
+
+    # Grab the rendered page once and parse it offline; per-cell WebDriver calls
+    # cost an IPC round trip each and dominated the parse time.
     try:
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "table.calendar__table tr.calendar__row"))
-        )
+        page_html = driver.page_source
     except Exception as e:
-        print(f"Timeout or error waiting for calendar table rows on {url}: {e}")
-        # Check for "no events" message
-        try:
-            no_events_msg = driver.find_element(By.XPATH, "//*[contains(text(),'There are no news events scheduled')]")
-            if no_events_msg:
-                print("No news events scheduled for this day.")
-                return []
-        except:
-            pass # No "no events" message found, or other error
+        print(f"Could not read page source on {target_date_obj.strftime('%Y-%m-%d')}: {e}")
         return []
 
-    scroll_to_bottom(driver)
+    events_data = parse_calendar_html(page_html, target_date_obj, unknown_impact_prefix="Unknown Impact Title: ")
+    if not events_data:
+        print(f"Could not find calendar table or rows on {target_date_obj.strftime('%Y-%m-%d')}")
+    return events_data
 
-    events_data = []
-    current_event_time_str = None # Carries over time for events under same timestamp
 
-    try:
-        calendar_table = driver.find_element(By.CSS_SELECTOR, "table.calendar__table")
-        all_rows = calendar_table.find_elements(By.CSS_SELECTOR, "tr.calendar__row") # More specific
-    except Exception as e:
-        print(f"Could not find calendar table or rows on {target_date_obj.strftime('%Y-%m-%d')}: {e}")
-        return []
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape one day (or a short range) of the Forex Factory calendar.")
+    parser.add_argument("--start", type=date.fromisoformat, default=date.today(), help="Day to scrape, YYYY-MM-DD (default: today)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last day (inclusive) of a short range; default: --start")
+    parser.add_argument("--max-rate", type=float, default=0.5, help="Most pages per second")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Where the year/month partitions are written")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="SQLite event store to upsert into")
+    parser.add_argument("--no-store", action="store_true", help="Don't write to the event store")
+    return parser.parse_args(argv)
 
-    for row_index, row in enumerate(all_rows):
-        # Check if it's a "Date Header" row (e.g., "Thursday, Jan 1")
-        # These typically have one <td> with a colspan attribute and class 'calendar__date'
-        try:
-            date_header_cell = row.find_element(By.CSS_SELECTOR, "td.calendar__date[colspan]")
-            # print(f"Skipping date header row: {date_header_cell.text.strip()}")
-            continue # Skip this row, it's just a date separator
-        except:
-            # Not a date header row by the above criteria, proceed to parse as event
-            pass
-
-        # Attempt to parse as an event row.
-        # Event rows should have specific cells. We'll use class-based selection.
-        try:
-            time_cell_text = row.find_element(By.CSS_SELECTOR, "td.calendar__time").text.strip()
-            currency = row.find_element(By.CSS_SELECTOR, "td.calendar__currency").text.strip()
-            impact_cell_element = row.find_element(By.CSS_SELECTOR, "td.calendar__impact")
-            event_name_element = row.find_element(By.CSS_SELECTOR, "td.calendar__event")
-            event_name = event_name_element.text.strip()
-            # Sometimes event name might be inside a div or span
-            if not event_name: # If text of td is empty, try to find inner div
-                try:
-                    event_name = event_name_element.find_element(By.TAG_NAME, "div").text.strip()
-                except:
-                    pass # stick with empty if no div
-
-            actual = row.find_element(By.CSS_SELECTOR, "td.calendar__actual").text.strip()
-            forecast = row.find_element(By.CSS_SELECTOR, "td.calendar__forecast").text.strip()
-            previous = row.find_element(By.CSS_SELECTOR, "td.calendar__previous").text.strip()
-
-        except Exception as e:
-            # This row doesn't have the expected structure of an event row.
-            # It could be an empty row, a malformed row, or one we haven't accounted for.
-            # print(f"Skipping row {row_index+1} due to missing standard event cell structure. Text: '{row.text[:100]}'. Error: {e}")
-            continue
-
-        # Process time
-        if time_cell_text: # If this row explicitly specifies a time
-            current_event_time_str = time_cell_text
-        
-        if not current_event_time_str: # Should not happen if first event has time
-            print(f"Warning: No current_event_time_str for event '{event_name}'. Skipping.")
-            continue
-
-        event_datetime_obj = None
-        datetime_display_str = f"{target_date_obj.strftime('%Y-%m-%d')} {current_event_time_str}"
-
-        if current_event_time_str.lower() == "all day":
-            event_datetime_obj = datetime.combine(target_date_obj, datetime.min.time())
-            datetime_display_str = event_datetime_obj.strftime("%Y-%m-%d %H:%M:%S")
-        elif "tentative" in current_event_time_str.lower():
-            event_datetime_obj = datetime.combine(target_date_obj, datetime.min.time())
-            datetime_display_str = f"{target_date_obj.strftime('%Y-%m-%d')} Tentative"
-        else:
-            try:
-                # Forex Factory usually shows am/pm
-                time_part = datetime.strptime(current_event_time_str, "%I:%M%p").time()
-                event_datetime_obj = datetime.combine(target_date_obj, time_part)
-                datetime_display_str = event_datetime_obj.strftime("%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                # This can happen if time is something else like '--' or unexpected format
-                print(f"Warning: Could not parse time '{current_event_time_str}' for event '{event_name}'. Using date and raw time string.")
-                event_datetime_obj = datetime.combine(target_date_obj, datetime.min.time()) # Default to midnight
-
-
-        impact = parse_impact(impact_cell_element)
-
-        events_data.append({
-            "datetime": datetime_display_str,
-            "currency": currency,
-            "impact": impact,
-            "event": event_name,
-            "actual": actual,
-            "forecast": forecast,
-            "previous": previous
-        })
-            
-    return events_data
 
+def main(argv=None):
+    args = parse_args(argv)
+    start_date = args.start
+    end_date = args.end or args.start # Inclusive
+    if end_date < start_date:
+        print(f"--end {end_date} is before --start {start_date}.")
+        return
 
-def main():
     driver = setup_driver()
     if not driver:
         print("Driver setup failed. Exiting.")
         return
 
-    # Define your date range
-    start_date = date(2016, 3, 1)
-    end_date = date(2016, 3, 1) # Inclusive
-    
-    # For a single day test:
-    # start_date = date(2024, 3, 15) # Example of a more recent date
-    # end_date = date(2024, 3, 15)
-
-
-    all_scraped_data = []
+    output_writer = PartitionedWriter(os.path.join(args.output_dir, f"{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}"),
+                                      formats=("csv",), reset=True)
+    event_store = EventStore(args.store) if not args.no_store else None # Re-scraped days update the stored rows in place
     current_scrape_date = start_date
+    rate_limiter = TokenBucket(rate=args.max_rate) # Be polite to the server: by default at most one page every 2 seconds
 
     try:
         while current_scrape_date <= end_date:
+            rate_limiter.acquire()
             daily_data = scrape_day_data(driver, current_scrape_date)
-            if daily_data: # Only extend if data was found
-                all_scraped_data.extend(daily_data)
+            output_writer.write_day(current_scrape_date, daily_data) # Streamed to disk, nothing kept in memory
+            if daily_data and event_store is not None: # [] also means the page failed, which must not wipe the stored day
+                event_store.write_day(current_scrape_date, daily_data)
             current_scrape_date += timedelta(days=1)
-            if current_scrape_date <= end_date: # Avoid sleeping after the last day
-                 print("Sleeping for 2 seconds before next day...")
-                 time.sleep(2) # Be polite to the server
     finally:
         print("Quitting driver...")
         driver.quit()
+        if event_store is not None:
+            event_store.close()
 
-    if all_scraped_data:
-        df = pd.DataFrame(all_scraped_data)
-        df = df[['datetime', 'currency', 'impact', 'event', 'actual', 'forecast', 'previous']] # Ensure column order
-        
-        output_filename = f"forex_factory_data_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.csv"
-        df.to_csv(output_filename, index=False, encoding='utf-8-sig') # utf-8-sig for Excel compatibility
-        print(f"\nData saved to {output_filename}")
-        print("Sample of scraped data:")
-        print(df.head())
+    output_filename = f"forex_factory_data_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.csv"
+    total = output_writer.finalize(output_filename, start_date, end_date) # utf-8-sig for Excel compatibility
+    if total:
+        print(f"\nData saved to {output_filename} ({total} events)")
     else:
         print("\nNo data was scraped for the specified date range.")
 
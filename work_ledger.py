@@ -0,0 +1,379 @@
+"""
+Shared work ledger for backfills spread over several machines.
+
+One NUM_WORKERS process per box is limited by how much traffic Cloudflare
+tolerates from one IP. With a ledger, every machine runs the batch scraper
+against the same SQLite file on a shared volume, and each one scrapes with its own
+IP and its own rate limit:
+
+- the first node to start plans the page units (fetch_planner.FetchUnit);
+  later nodes insert the same units, so nothing is planned twice
+- a node leases one unit at a time. The lease carries its node id and an
+  expiry, and a heartbeat thread extends the node's leases while it works
+- a unit counts as done only after its days were written (complete() is
+  called by the writer, not the fetcher)
+- leases of a node that died (no heartbeat) expire and are taken over by
+  the next node that asks. Failed units are retried up to max_attempts times
+- complete() only succeeds for the unit's current lease holder, so when a
+  slow node loses a unit, its late result does not count
+
+Every node writes its own output shard (<run dir>/node=<id>/...). When
+all units are done, `merge` rebuilds one dataset: for each day it takes
+the rows of the node that completed that day's unit according to the ledger,
+so the result doesn't depend on which nodes happened to scrape a day twice.
+
+    python workets_scrapper.py --start 2015-01-01 --end 2024-12-31 --ledger /mnt/shared/ff_ledger.sqlite
+    python work_ledger.py status --ledger /mnt/shared/ff_ledger.sqlite
+    python work_ledger.py merge --ledger /mnt/shared/ff_ledger.sqlite --shards ff_output/20150101_to_20241231
+
+SQLite's locking must work on the shared volume (local disks, SMB and most
+NFSv4 setups do). The ledger uses the rollback journal, not WAL, because WAL
+needs shared memory that network filesystems don't provide.
+"""
+import argparse
+import csv
+import glob
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from fetch_planner import FetchUnit
+
+DEFAULT_LEASE_SECONDS = 120
+DEFAULT_MAX_ATTEMPTS = 3
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    unit_key TEXT PRIMARY KEY,
+    view TEXT NOT NULL,
+    page_start TEXT NOT NULL,
+    page_end TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    status TEXT NOT NULL,
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    finished_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS units_status ON units(status, page_start);
+CREATE TABLE IF NOT EXISTS nodes (
+    node_id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+"""
+
+
+def default_node_id():
+    """Host name, so a restarted node keeps its shard directory."""
+    return socket.gethostname().split(".")[0]
+
+
+def unit_key(unit):
+    return f"{unit.view}:{unit.page_start.isoformat()}:{unit.start.isoformat()}:{unit.end.isoformat()}"
+
+
+def _unit_from_row(view, page_start, page_end, start, end):
+    return FetchUnit(view, date.fromisoformat(page_start), date.fromisoformat(page_end),
+                     date.fromisoformat(start), date.fromisoformat(end))
+
+
+class WorkLedger:
+    def __init__(self, path, node_id=None, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 register=True):
+        """register=False opens the ledger without joining as a node, e.g. to inspect it."""
+        self.path = path
+        self.node_id = node_id or default_node_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode; write transactions are opened explicitly with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=DELETE")
+        self._db.executescript(_SCHEMA)
+        self.reclaimed = 0
+        if not register:
+            return
+        now = time.time()
+        with self._write() as db:
+            db.execute("INSERT INTO nodes (node_id, host, pid, started, last_seen) VALUES (?, ?, ?, ?, ?) "
+                       "ON CONFLICT (node_id) DO UPDATE SET host = excluded.host, pid = excluded.pid, "
+                       "started = excluded.started, last_seen = excluded.last_seen",
+                       (self.node_id, socket.gethostname(), os.getpid(), now, now))
+
+    @contextmanager
+    def _write(self):
+        """A write transaction. BEGIN IMMEDIATE takes the database write lock up front, so leases can't race."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def plan(self, units):
+        """Adds units that aren't in the ledger yet. Returns how many were new."""
+        rows = [(unit_key(u), u.view, u.page_start.isoformat(), u.page_end.isoformat(), u.start.isoformat(),
+                 u.end.isoformat(), PENDING) for u in units]
+        with self._write() as db:
+            before = db.total_changes
+            db.executemany("INSERT OR IGNORE INTO units (unit_key, view, page_start, page_end, start, end, status) "
+                           "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            return db.total_changes - before
+
+    def lease(self, start_date=None, end_date=None):
+        """
+        Leases the earliest available unit (pending, expired or retryable) to
+        this node, optionally within start_date..end_date. Returns a FetchUnit or None.
+        """
+        now = time.time()
+        sql = ("SELECT unit_key, view, page_start, page_end, start, end, status FROM units "
+               "WHERE (status = ? OR (status = ? AND lease_expires < ?) OR (status = ? AND attempts < ?))")
+        params = [PENDING, LEASED, now, FAILED, self.max_attempts]
+        if start_date is not None:
+            sql += " AND end >= ? AND start <= ?"
+            params += [start_date.isoformat(), end_date.isoformat()]
+        sql += " ORDER BY page_start, unit_key LIMIT 1"
+        with self._write() as db:
+            row = db.execute(sql, params).fetchone()
+            if row is None:
+                return None
+            key, status = row[0], row[6]
+            db.execute("UPDATE units SET status = ?, owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                       "error = NULL WHERE unit_key = ?", (LEASED, self.node_id, now + self.lease_seconds, key))
+            db.execute("UPDATE nodes SET last_seen = ? WHERE node_id = ?", (now, self.node_id))
+        if status == LEASED:
+            self.reclaimed += 1
+            print(f"[Ledger] Reclaimed expired lease on {key}")
+        return _unit_from_row(*row[1:6])
+
+    def heartbeat(self):
+        """Extends every lease this node holds. Returns how many."""
+        now = time.time()
+        with self._write() as db:
+            renewed = db.execute("UPDATE units SET lease_expires = ? WHERE owner = ? AND status = ?",
+                                 (now + self.lease_seconds, self.node_id, LEASED)).rowcount
+            db.execute("UPDATE nodes SET last_seen = ? WHERE node_id = ?", (now, self.node_id))
+        return renewed
+
+    def start_heartbeat(self, interval=None):
+        """Calls heartbeat() every `interval` seconds (a third of the lease) until the returned event is set."""
+        stop = threading.Event()
+        interval = interval or self.lease_seconds / 3
+
+        def beat():
+            while not stop.wait(interval):
+                try:
+                    self.heartbeat()
+                except sqlite3.Error as e:
+                    print(f"[Ledger] Heartbeat failed: {e}")
+
+        threading.Thread(target=beat, name="ledger-heartbeat", daemon=True).start()
+        return stop
+
+    def complete(self, unit, ok=True, error=None):
+        """
+        Marks a leased unit done or failed. Returns False if this node no
+        longer holds the lease (another node took it over).
+        """
+        with self._write() as db:
+            return db.execute("UPDATE units SET status = ?, finished_at = ?, error = ?, lease_expires = NULL "
+                              "WHERE unit_key = ? AND owner = ? AND status = ?",
+                              (DONE if ok else FAILED, time.time(), None if ok else error or "page not loaded",
+                               unit_key(unit), self.node_id, LEASED)).rowcount == 1
+
+    def release_all(self):
+        """Hands this node's open leases back, e.g. on Ctrl-C, so others needn't wait for them to expire."""
+        with self._write() as db:
+            return db.execute("UPDATE units SET status = ?, owner = NULL, lease_expires = NULL, "
+                              "attempts = MAX(attempts - 1, 0) WHERE owner = ? AND status = ?",
+                              (PENDING, self.node_id, LEASED)).rowcount
+
+    def summary(self, start_date=None, end_date=None):
+        """Unit counts by status (expired leases count as pending), units done per node, and node liveness."""
+        now = time.time()
+        sql = "SELECT status, owner, lease_expires, attempts FROM units"
+        params = []
+        if start_date is not None:
+            sql += " WHERE end >= ? AND start <= ?"
+            params = [start_date.isoformat(), end_date.isoformat()]
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0, "retryable": 0, "total": 0}
+        done_by_node = {}
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+            nodes = self._db.execute("SELECT node_id, host, last_seen FROM nodes ORDER BY node_id").fetchall()
+        for status, owner, lease_expires, attempts in rows:
+            counts["total"] += 1
+            if status == LEASED and lease_expires is not None and lease_expires < now:
+                status = PENDING
+            counts[status] += 1
+            if status == FAILED and attempts < self.max_attempts:
+                counts["retryable"] += 1
+            if status == DONE:
+                done_by_node[owner] = done_by_node.get(owner, 0) + 1
+        counts["done_by_node"] = done_by_node
+        counts["nodes"] = [{"node_id": node_id, "host": host, "seconds_since_seen": round(now - last_seen)}
+                           for node_id, host, last_seen in nodes]
+        return counts
+
+    def day_owners(self, start_date=None, end_date=None):
+        """{day ISO string: node_id} of the node that completed each day's unit."""
+        sql = "SELECT view, page_start, page_end, start, end, owner FROM units WHERE status = ?"
+        with self._lock:
+            rows = self._db.execute(sql, (DONE,)).fetchall()
+        owners = {}
+        # Sorted, so overlapping units (planned by nodes with different ranges) resolve the same way every time
+        for row in sorted(rows):
+            unit = _unit_from_row(*row[:5])
+            for day in unit.days():
+                if start_date is None or start_date <= day <= end_date:
+                    owners.setdefault(day.isoformat(), row[5])
+        return owners
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class LedgerWorkQueue:
+    """
+    work_scheduler.WorkQueue's interface on top of a WorkLedger, for
+    scrape_worker and the progress reporter. Units are finished in the
+    ledger by the writer (WorkLedger.complete), not by task_done.
+    """
+
+    def __init__(self, ledger, start_date=None, end_date=None):
+        self.ledger = ledger
+        self.start_date = start_date
+        self.end_date = end_date
+        self.total = ledger.summary(start_date, end_date)["total"]
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._durations = []
+        self.started = time.monotonic()
+
+    def get(self, worker_id):
+        unit = self.ledger.lease(self.start_date, self.end_date)
+        if unit is not None:
+            with self._lock:
+                self._in_flight[worker_id] = (unit, time.monotonic())
+        return unit
+
+    def task_done(self, worker_id, ok=True):
+        with self._lock:
+            unit, started = self._in_flight.pop(worker_id)
+            self._durations.append(time.monotonic() - started)
+
+    def drain(self):
+        return []  # Units nobody here could take stay in the ledger for the other nodes
+
+    def progress(self):
+        counts = self.ledger.summary(self.start_date, self.end_date)
+        with self._lock:
+            now = time.monotonic()
+            in_flight = sorted(((worker_id, unit, now - started) for worker_id, (unit, started) in self._in_flight.items()),
+                               key=lambda item: -item[2])
+            durations = sorted(self._durations)
+        return {
+            "completed": counts[DONE] + counts[FAILED] - counts["retryable"],
+            "failed": counts[FAILED] - counts["retryable"],
+            "in_flight": in_flight,
+            "remaining": counts[PENDING] + counts["retryable"],
+            "total": counts["total"],
+            "elapsed": now - self.started,
+            "median_unit_seconds": durations[len(durations) // 2] if durations else None,
+        }
+
+
+def shard_dir(run_output_dir, node_id):
+    return os.path.join(run_output_dir, f"node={node_id}")
+
+
+def merge_shards(ledger, shards_root, output_root, merged_path, start_date=None, end_date=None, formats=("csv",),
+                 site_timezone=None):
+    """
+    Builds one dataset from the node=<id> shards under shards_root: each day's
+    rows come from the node the ledger says completed it (days the ledger
+    doesn't know come from the first shard, by node id, that has them).
+    Writes partitions to output_root and the merged CSV. Returns the row count.
+    """
+    from partitioned_output import PartitionedWriter
+
+    owners = ledger.day_owners(start_date, end_date) if ledger is not None else {}
+    shards = sorted(path for path in glob.glob(os.path.join(shards_root, "node=*")) if os.path.isdir(path))
+    months = sorted({os.path.relpath(os.path.dirname(path), shard)
+                     for shard in shards for path in glob.glob(os.path.join(shard, "year=*", "month=*", "events.csv"))})
+    writer = PartitionedWriter(output_root, formats, reset=True, site_timezone=site_timezone)
+    for month in months:
+        chosen = {}  # day -> rows
+        for shard in shards:
+            node_id = os.path.basename(shard)[len("node="):]
+            path = os.path.join(shard, month, "events.csv")
+            if not os.path.exists(path):
+                continue
+            shard_days = {}
+            with open(path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    shard_days.setdefault(row["datetime"][:10], []).append(row)
+            for day, rows in shard_days.items():
+                owner = owners.get(day)
+                if day not in chosen and owner in (node_id, None):
+                    chosen[day] = rows
+        for day in sorted(chosen):
+            writer.write_day(date.fromisoformat(day), chosen[day])
+    print(f"Merged {len(shards)} shard(s) covering {len(months)} month(s)")
+    return writer.finalize(merged_path, start_date, end_date)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect a shared backfill ledger or merge the node shards.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    status = sub.add_parser("status", help="Unit counts, units done per node and node heartbeats")
+    status.add_argument("--ledger", required=True)
+    merge = sub.add_parser("merge", help="Merge the node=<id> shards into one dataset")
+    merge.add_argument("--ledger", help="Ledger that decides which node's rows win (default: first shard)")
+    merge.add_argument("--shards", required=True, help="Run output directory holding the node=<id> shards")
+    merge.add_argument("--output", help="Merged partitions directory (default: <shards>/merged)")
+    merge.add_argument("--csv", help="Merged CSV path (default: <shards>/merged.csv)")
+    merge.add_argument("--start", type=date.fromisoformat)
+    merge.add_argument("--end", type=date.fromisoformat)
+    args = parser.parse_args(argv)
+
+    ledger = WorkLedger(args.ledger, register=False) if args.ledger else None
+    try:
+        if args.command == "status":
+            counts = ledger.summary()
+            print(f"{counts['total']} units: {counts[DONE]} done, {counts[LEASED]} leased, {counts[PENDING]} pending, "
+                  f"{counts[FAILED]} failed ({counts['retryable']} will be retried)")
+            for node in counts["nodes"]:
+                print(f"  {node['node_id']:<20} {counts['done_by_node'].get(node['node_id'], 0):>6} done, "
+                      f"last seen {node['seconds_since_seen']}s ago ({node['host']})")
+            return
+        output = args.output or os.path.join(args.shards, "merged")
+        merged_csv = args.csv or os.path.join(args.shards, "merged.csv")
+        total = merge_shards(ledger, args.shards, output, merged_csv, args.start, args.end, formats=("csv", "parquet"))
+        print(f"{total} events written to {merged_csv} (partitions in {output})")
+    finally:
+        if ledger is not None:
+            ledger.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Shared work queue for the scraping workers.
+
+Handing each thread a fixed month meant the run lasted as long as its
+slowest month: holiday-heavy months, retries or one slow driver left a
+single worker busy at the end while the others sat idle. Here every page
+load (a fetch_planner.FetchUnit) is a separate work unit in one queue, and
+idle workers keep pulling from it until it is empty. progress() and the
+reporter thread show completed, in-flight and remaining units, including
+how long each in-flight unit has been running.
+"""
+import queue
+import threading
+import time
+
+
+class WorkQueue:
+    def __init__(self, units):
+        self._queue = queue.Queue()
+        for unit in units:
+            self._queue.put(unit)
+        self.total = len(units)
+        self._lock = threading.Lock()
+        self._in_flight = {}  # worker_id -> (unit, started)
+        self._completed = 0
+        self._failed = 0
+        self._durations = []
+        self.started = time.monotonic()
+
+    def get(self, worker_id):
+        """Next unit for worker_id, or None once the queue is drained."""
+        try:
+            unit = self._queue.get_nowait()
+        except queue.Empty:
+            return None
+        with self._lock:
+            self._in_flight[worker_id] = (unit, time.monotonic())
+        return unit
+
+    def task_done(self, worker_id, ok=True):
+        with self._lock:
+            unit, started = self._in_flight.pop(worker_id)
+            self._durations.append(time.monotonic() - started)
+            self._completed += 1
+            if not ok:
+                self._failed += 1
+        self._queue.task_done()
+
+    def drain(self):
+        """Removes and returns every unit not yet handed out, e.g. when no driver can be started."""
+        units = []
+        while True:
+            try:
+                units.append(self._queue.get_nowait())
+                self._queue.task_done()
+            except queue.Empty:
+                return units
+
+    def progress(self):
+        with self._lock:
+            now = time.monotonic()
+            in_flight = sorted(((worker_id, unit, now - started) for worker_id, (unit, started) in self._in_flight.items()),
+                               key=lambda item: -item[2])
+            durations = sorted(self._durations)
+            return {
+                "completed": self._completed,
+                "failed": self._failed,
+                "in_flight": in_flight,
+                "remaining": self._queue.qsize(),
+                "total": self.total,
+                "elapsed": now - self.started,
+                "median_unit_seconds": durations[len(durations) // 2] if durations else None,
+            }
+
+
+def format_progress(progress):
+    line = (f"[Progress] {progress['completed']}/{progress['total']} done ({progress['failed']} failed), "
+            f"{len(progress['in_flight'])} in flight, {progress['remaining']} queued, "
+            f"{progress['elapsed']:.0f}s elapsed")
+    if progress["median_unit_seconds"] is not None:
+        line += f", median {progress['median_unit_seconds']:.1f}s/unit"
+    if progress["in_flight"]:
+        line += " | " + ", ".join(f"W{worker_id}: {unit} ({age:.0f}s)" for worker_id, unit, age in progress["in_flight"])
+    return line
+
+
+def start_progress_reporter(work_queue, interval=30, extra=None):
+    """
+    Prints the queue's progress every `interval` seconds until the returned
+    event is set. extra, if given, is called for more text to append (e.g. the current rate).
+    """
+    stop = threading.Event()
+
+    def report():
+        while not stop.wait(interval):
+            line = format_progress(work_queue.progress())
+            print(f"{line} | {extra()}" if extra else line)
+
+    threading.Thread(target=report, name="progress-reporter", daemon=True).start()
+    return stop
@@ -1,25 +1,96 @@
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import pandas as pd
 import time
-from datetime import datetime, timedelta, date
+from datetime import timedelta, date
 import os
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from calendar import monthrange
 import threading # <--- Import threading
+import argparse
+
+from calendar_parser import (parse_calendar_html, parse_fetch_unit, format_event_datetime, impact_from_title, is_challenge_page,
+                             DEFAULT_SITE_TIMEZONE)
+from fetch_planner import plan_fetches, day_url
+from html_cache import HtmlCache, DEFAULT_CACHE_DIR, plan_replay, parse_replay_page
+from driver_pool import DriverPool
+from rate_limiter import AdaptiveRateLimiter
+from work_scheduler import WorkQueue, start_progress_reporter, format_progress
+from page_ready import wait_for_calendar_ready, TIMEOUT
+from backfill_checkpoint import (BackfillCheckpoint, DEFAULT_CHECKPOINT_DIR, contiguous_ranges,
+                                 events_by_day)
+from partitioned_output import PartitionedWriter, DEFAULT_OUTPUT_DIR
+from event_store import EventStore, DEFAULT_STORE_PATH
+from pipeline import StagedPipeline, parse_unit_page, format_depths
+from work_ledger import WorkLedger, LedgerWorkQueue, DEFAULT_LEASE_SECONDS, shard_dir
+from browser_profile import apply_lean_options, enable_resource_blocking, driver_rss_mb, navigation_timing
+from metrics import (Metrics, DEFAULT_METRICS_PATH, BROWSER_FALLBACKS, CLOUDFLARE_BLOCKS, EMPTY_DAYS, FAILED_PAGES,
+                     PAGES, TIMEOUTS, UNCHANGED_DAYS, format_metrics)
 
 # --- Configuration ---
 NUM_WORKERS = 3
-CHUNK_SIZE_MONTHS = 1
+PROGRESS_INTERVAL_SECONDS = 30
+MAX_PAGES_PER_SECOND = 2.0 # Ceiling for all workers together; the limiter backs off below it when blocked
+FETCH_VIEW = "auto" # "day", "week", "month" or "auto" (fewest page loads)
+HTML_CACHE_DIR = DEFAULT_CACHE_DIR # Set to None to disable the raw page cache
+HTML_CACHE_MAX_MB = 2048
+CHECKPOINT_DIR = DEFAULT_CHECKPOINT_DIR
+OUTPUT_DIR = DEFAULT_OUTPUT_DIR
+OUTPUT_FORMATS = ("csv", "parquet") # Parquet partitions need pyarrow
+MAX_PAGES_PER_DRIVER = 200 # Recycle a browser after this many page loads
+FETCH_ENGINE = "browser" # "browser": threaded workers; "async": one browser's cookies, many HTTP requests in flight (needs aiohttp)
+ASYNC_CONCURRENCY = 32 # Pages in flight for --engine async
+PARSE_PROCESSES = None # Parser processes; None uses every core, 0 parses on a thread
+FETCHED_QUEUE_SIZE = 32 # Raw pages waiting to be parsed before fetchers block
+PARSED_QUEUE_SIZE = 32 # Parsed pages waiting for the writer before parsers block
+HTTP_FAST_PATH = True # Fetch pages over plain HTTP with the browser's cookies; the browser only handles challenges
+LEAN_BROWSER = False # No images, small window, ads/trackers/fonts blocked (see browser_profile.py); --lean-browser
+RSS_SAMPLE_PAGES = 20 # Measure each driver's memory every this many pages
+EVENT_STORE_PATH = DEFAULT_STORE_PATH # SQLite store every run upserts into; None disables it
+SITE_TIMEZONE = DEFAULT_SITE_TIMEZONE # Timezone Forex Factory shows times in; used for the UTC columns
+METRICS_PATH = DEFAULT_METRICS_PATH # Per-phase timings and counters as JSON lines; None disables the file
+METRICS_INTERVAL_SECONDS = 30 # How often a summary line (and the Prometheus file) is written
+HOT_PAST_DAYS = 14 # --refresh re-fetches the days from this many days ago...
+HOT_FUTURE_DAYS = 7 # ...up to this many days ahead; older finished days are treated as immutable
 # --- End Configuration ---
 
+# Raw HTML cache of every loaded page, shared by all workers (None disables it)
+html_cache = None
+# Day-level progress of the current backfill, shared by all workers
+checkpoint = None
+
+# One request rate for all workers, adapted to how the site responds
+rate_limiter = AdaptiveRateLimiter(MAX_PAGES_PER_SECOND)
+
+# Year/month partitioned output that finished days are streamed into
+output_writer = None
+
+# Indexed SQLite store that finished days are upserted into (None disables it)
+event_store = None
+
+# Warm drivers leased to the workers, created in main()
+driver_pool = None
+
+# Pooled HTTP session reusing the browsers' Cloudflare clearance (None: browser only)
+http_fetcher = None
+
+# Fetch -> parse -> write stages; fetchers put raw pages in, one writer checkpoints them
+pipeline = None
+
+# Per-phase timings and counters (see metrics.py); main() adds the JSON lines file
+metrics = Metrics()
+
+# Shared multi-machine work ledger (--ledger); None when this process plans its own work
+ledger = None
+
 # Global lock for driver setup
 driver_setup_lock = threading.Lock() # <--- Initialize the lock
 
-def setup_worker_driver():
-    """Sets up a Chrome driver instance for a worker thread, protected by a lock."""
+def setup_worker_driver(lean=LEAN_BROWSER):
+    """
+    Sets up a Chrome driver instance for a worker thread, protected by a lock.
+    lean starts it with the resource-blocking profile from browser_profile.py.
+    """
+    # The browser stack is imported here, so replay and the offline tools start without it
+    import undetected_chromedriver as uc
+    from selenium.webdriver.common.by import By
+
     driver = None
     with driver_setup_lock: # <--- Acquire lock before setup
         print(f"[DriverSetup {os.getpid()}] Attempting to set up driver...")
@@ -30,6 +101,8 @@ def setup_worker_driver():
             options.add_argument('--password-store=basic')
             # options.add_argument('--headless')
             # options.add_argument('--disable-gpu')
+            if lean:
+                apply_lean_options(options)
 
             # Ensure the directory for undetected_chromedriver exists
             # This might not be strictly necessary if uc handles it, but can't hurt
@@ -46,6 +119,12 @@ def setup_worker_driver():
             driver = uc.Chrome(options=options)
             print(f"[DriverSetup {os.getpid()}] Driver created successfully.")
             # driver.maximize_window()
+            if lean:
+                try:
+                    blocked = enable_resource_blocking(driver) # Before the first navigation
+                    print(f"[DriverSetup {os.getpid()}] Lean profile: {blocked} URL patterns blocked.")
+                except Exception as e:
+                    print(f"[DriverSetup {os.getpid()}] Warning: Could not enable resource blocking: {e}")
 
             driver.get("https://www.forexfactory.com/calendar")
             print(f"[DriverSetup {os.getpid()}] Navigated to calendar. Waiting for page load...")
@@ -68,17 +147,20 @@ def setup_worker_driver():
     # Lock is released automatically when exiting the 'with' block
     return driver
 
+def setup_timed_driver(lean=LEAN_BROWSER):
+    """setup_worker_driver for the driver pool, timed including the wait for the setup lock."""
+    with metrics.timer("setup_worker_driver"):
+        return setup_worker_driver(lean)
+
 # ... (rest of your code: generate_url_for_date, scroll_to_bottom, parse_impact, scrape_day_data)
 # Ensure that these functions DO NOT call setup_worker_driver themselves.
-# scrape_date_range_worker is the one that calls setup_worker_driver.
+# Only the driver_pool calls setup_worker_driver.
 
 def generate_url_for_date(target_date):
-    month_abbr = target_date.strftime("%b").lower()
-    day_num = target_date.day
-    year_num = target_date.year
-    return f"https://www.forexfactory.com/calendar?day={month_abbr}{day_num}.{year_num}"
+    return day_url(target_date)
 
 def scroll_to_bottom(driver, worker_id=""):
+    """Fixed-sleep scrolling, only used when wait_for_calendar_ready times out with rows still arriving."""
     # print(f"[Worker {worker_id}] Scrolling to load all events...")
     last_height = driver.execute_script("return document.body.scrollHeight")
     attempts = 0
@@ -98,40 +180,20 @@ def scroll_to_bottom(driver, worker_id=""):
 
 
 def parse_impact(impact_cell_element):
+    from selenium.webdriver.common.by import By
     try:
         span = impact_cell_element.find_element(By.TAG_NAME, "span")
-        title = span.get_attribute("title").lower()
-        if "non-economic" in title or "holiday" in title:
-            return "Holiday"
-        elif "low impact expected" in title:
-            return "Low"
-        elif "medium impact expected" in title:
-            return "Medium"
-        elif "high impact expected" in title:
-            return "High"
-        return "Unknown Impact: " + title
+        return impact_from_title(span.get_attribute("title"))
     except:
         return "N/A"
 
-def scrape_day_data(driver, target_date_obj, worker_id=""):
-    url = generate_url_for_date(target_date_obj)
-    # print(f"[Worker {worker_id}] Scraping {target_date_obj.strftime('%Y-%m-%d')} from {url}")
-    driver.get(url)
-
-    try:
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "table.calendar__table tr.calendar__row"))
-        )
-    except Exception:
-        try:
-            if "There are no news events scheduled" in driver.page_source:
-                # print(f"[Worker {worker_id}] No events for {target_date_obj.strftime('%Y-%m-%d')}")
-                return []
-        except: pass # Ignore if page_source check fails
-        # print(f"[Worker {worker_id}] Timeout/Error for {target_date_obj.strftime('%Y-%m-%d')}")
-        return []
+def extract_rows_webdriver(driver, target_date_obj):
+    """
+    Per-element extraction through the WebDriver. Every cell costs an IPC round trip,
+    so this is only kept as the reference path for benchmarks/bench_parse.py.
+    """
+    from selenium.webdriver.common.by import By
 
-    scroll_to_bottom(driver, worker_id)
     events_data = []
     current_event_time_str = None
 
@@ -169,166 +231,492 @@ def scrape_day_data(driver, target_date_obj, worker_id=""):
         if not current_event_time_str:
             continue
 
-        datetime_display_str = f"{target_date_obj.strftime('%Y-%m-%d')} {current_event_time_str}"
-        if current_event_time_str.lower() == "all day":
-            event_datetime_obj = datetime.combine(target_date_obj, datetime.min.time())
-            datetime_display_str = event_datetime_obj.strftime("%Y-%m-%d %H:%M:%S")
-        elif "tentative" in current_event_time_str.lower():
-            datetime_display_str = f"{target_date_obj.strftime('%Y-%m-%d')} Tentative"
-        else:
-            try:
-                time_part = datetime.strptime(current_event_time_str, "%I:%M%p").time()
-                event_datetime_obj = datetime.combine(target_date_obj, time_part)
-                datetime_display_str = event_datetime_obj.strftime("%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                pass # Keep raw time string if parsing fails
-
         impact = parse_impact(impact_cell_element)
         events_data.append({
-            "datetime": datetime_display_str, "currency": currency, "impact": impact,
+            "datetime": format_event_datetime(target_date_obj, current_event_time_str),
+            "currency": currency, "impact": impact,
             "event": event_name, "actual": actual, "forecast": forecast, "previous": previous
         })
     return events_data
 
-def scrape_date_range_worker(chunk_start_date, chunk_end_date, worker_id):
+def load_calendar_page(driver, url, worker_id=""):
     """
-    Worker function to scrape data for a given date range (chunk).
-    Each worker manages its own driver.
+    Returns a calendar page's HTML, over HTTP when the fast path has cookies
+    and otherwise by navigating the browser and waiting for the table.
+    A "no events" page is returned as is (it parses to no rows). Returns None
+    when the table never showed up, e.g. on a timeout or a blocked page.
+    Every page waits for the shared rate limiter, and timeouts and
+    Cloudflare challenges (in the browser or over HTTP) slow it down. Loaded pages are stored in the HTML
+    cache when one is configured.
     """
-    print(f"[Worker {worker_id} ({os.getpid()})] Starting. Range: {chunk_start_date.strftime('%Y-%m-%d')} to {chunk_end_date.strftime('%Y-%m-%d')}")
-    driver = setup_worker_driver() # This call is now thread-safe
-    if not driver:
-        print(f"[Worker {worker_id} ({os.getpid()})] Failed to initialize driver. Exiting task.")
-        return []
+    # print(f"[Worker {worker_id}] Loading {url}")
+    rate_limiter.acquire()
+    if http_fetcher is not None and http_fetcher.ready:
+        with metrics.timer("http_fetch", worker_id):
+            page_html = http_fetcher.fetch(url)
+        if page_html is not None:
+            rate_limiter.on_success()
+            cache_page(url, page_html)
+            return page_html
+    with metrics.timer("driver.get", worker_id):
+        driver.get(url)
+
+    with metrics.timer("wait", worker_id):
+        ready = wait_for_calendar_ready(driver, timeout=15)
+    if ready.status == TIMEOUT:
+        metrics.count(TIMEOUTS, worker=worker_id, url=url)
+        if ready.rows == 0:
+            try:
+                page_html = driver.page_source
+                if "There are no news events scheduled" in page_html:
+                    rate_limiter.on_success()
+                    cache_page(url, page_html)
+                    if http_fetcher is not None:
+                        http_fetcher.note_browser_page(driver)
+                    return page_html
+                if is_challenge_page(page_html):
+                    print(f"[Worker {worker_id}] Cloudflare challenge on {url}")
+                    metrics.count(CLOUDFLARE_BLOCKS, worker=worker_id, url=url, source="browser")
+                    rate_limiter.on_throttle("Cloudflare challenge")
+                    return None
+            except: pass # Ignore if page_source check fails
+            # print(f"[Worker {worker_id}] Timeout/Error for {url}")
+            rate_limiter.on_throttle("timeout")
+            return None
+        # Rows were still arriving when the wait ran out; fall back to scrolling.
+        with metrics.timer("scroll", worker_id):
+            scroll_to_bottom(driver, worker_id)
 
-    all_chunk_data = []
-    current_day = chunk_start_date
+    # One page_source snapshot instead of ~11 WebDriver calls per row.
     try:
-        while current_day <= chunk_end_date:
-            # print(f"[Worker {worker_id}] Processing day: {current_day.strftime('%Y-%m-%d')}")
-            daily_data = scrape_day_data(driver, current_day, worker_id)
-            if daily_data:
-                all_chunk_data.extend(daily_data)
-            
-            time.sleep(1.5) 
-            
-            current_day += timedelta(days=1)
+        with metrics.timer("page_source", worker_id):
+            page_html = driver.page_source
+    except Exception:
+        return None
+    timing = navigation_timing(driver)
+    if timing is not None: # The browser's own load time, without the readiness wait
+        metrics.observe("page_load", timing["load"], worker_id, resources=timing["resources"],
+                        transfer_kb=round(timing["transfer_kb"], 1))
+    rate_limiter.on_success()
+    cache_page(url, page_html)
+    if http_fetcher is not None:
+        http_fetcher.note_browser_page(driver) # Picks up fresh cookies after a challenge
+    return page_html
+
+def cache_page(url, page_html):
+    if html_cache is None:
+        return
+    try:
+        html_cache.put(url, page_html)
     except Exception as e:
-        print(f"[Worker {worker_id} ({os.getpid()})] Error during scraping range {chunk_start_date} - {chunk_end_date}: {e}")
-    finally:
-        if driver:
-            print(f"[Worker {worker_id} ({os.getpid()})] Quitting driver.")
-            driver.quit() # This should also be safe now.
-    
-    print(f"[Worker {worker_id} ({os.getpid()})] Finished. Found {len(all_chunk_data)} events in range.")
-    return all_chunk_data
-
-
-def create_date_chunks(overall_start_date, overall_end_date, chunk_months):
-    chunks = []
-    current_start = overall_start_date
-    while current_start <= overall_end_date:
-        year = current_start.year
-        month = current_start.month
-        
-        chunk_end_month = month + chunk_months - 1
-        chunk_end_year = year
-        
-        while chunk_end_month > 12:
-            chunk_end_month -= 12
-            chunk_end_year += 1
-            
-        days_in_month = monthrange(chunk_end_year, chunk_end_month)[1]
-        # Make sure chunk_end_day does not exceed the day of overall_end_date if it's the last chunk month
-        if chunk_end_year == overall_end_date.year and chunk_end_month == overall_end_date.month:
-            chunk_end_day = min(days_in_month, overall_end_date.day)
-        else:
-            chunk_end_day = days_in_month
-
-        current_chunk_end = date(chunk_end_year, chunk_end_month, chunk_end_day)
-        current_chunk_end = min(current_chunk_end, overall_end_date)
-        
-        chunks.append((current_start, current_chunk_end))
-        
-        current_start = current_chunk_end + timedelta(days=1)
-        if current_start > overall_end_date:
-            break
-            
-    return chunks
-
+        print(f"[Cache] Could not store {url}: {e}")
 
-def main():
-    overall_start_date = date(2015, 1, 1)
-    #overall_end_date = date(2024, 12, 31) # Example: ~10 years of data
-    overall_end_date = date(2015, 3, 31) # Shorter range for testing
-
-    print(f"Starting Forex Factory Scraper for range: {overall_start_date} to {overall_end_date}")
-    print(f"Number of parallel workers: {NUM_WORKERS}")
-    print(f"Chunk size: {CHUNK_SIZE_MONTHS} month(s) per worker batch")
+def scrape_unit_data(driver, unit, worker_id=""):
+    """
+    Scrapes one planned page (day, week or month) and returns the events inside
+    unit.start..unit.end, or None if the page could not be loaded.
+    """
+    page_html = load_calendar_page(driver, unit.url, worker_id)
+    if page_html is None:
+        return None
+    return parse_fetch_unit(page_html, unit)
 
-    date_chunks = create_date_chunks(overall_start_date, overall_end_date, CHUNK_SIZE_MONTHS)
-    
-    if not date_chunks:
-        print("No date chunks to process.")
-        return
+def scrape_day_data(driver, target_date_obj, worker_id=""):
+    page_html = load_calendar_page(driver, generate_url_for_date(target_date_obj), worker_id)
+    if not page_html:
+        return []
+    return parse_calendar_html(page_html, target_date_obj)
 
-    print(f"Total chunks to process: {len(date_chunks)}")
+def scrape_worker(worker_id, work_queue):
+    """
+    Worker thread: leases a driver from the shared driver_pool and keeps pulling
+    page units from work_queue until it is empty. Workers only fetch: each
+    page's HTML goes to the pipeline, which parses and checkpoints it.
+    Returns the number of pages loaded.
+    """
+    print(f"[Worker {worker_id} ({os.getpid()})] Starting.")
+    pages_loaded = 0
+    while True:
+        with driver_pool.lease() as lease:
+            if lease.driver is None:
+                print(f"[Worker {worker_id} ({os.getpid()})] Failed to get a driver. Exiting.")
+                return pages_loaded
+            while True:
+                unit = work_queue.get(worker_id)
+                if unit is None:
+                    print(f"[Worker {worker_id} ({os.getpid()})] Queue empty. Loaded {pages_loaded} pages.")
+                    return pages_loaded
+                # print(f"[Worker {worker_id}] Processing {unit}")
+                try:
+                    with metrics.timer("page", worker_id, unit=str(unit)):
+                        page_html = load_calendar_page(lease.driver, unit.url, worker_id)
+                except Exception as e:
+                    print(f"[Worker {worker_id} ({os.getpid()})] Error while scraping {unit}: {e}")
+                    page_html = None
+                lease.pages += 1
+                if lease.pages % RSS_SAMPLE_PAGES == 1:
+                    rss_mb = driver_rss_mb(lease.driver)
+                    if rss_mb is not None:
+                        metrics.gauge("driver_rss_mb", round(rss_mb, 1), worker_id)
+                pipeline.put(unit, page_html, None if page_html is not None else "page not loaded")
+                work_queue.task_done(worker_id, ok=page_html is not None)
+                if page_html is None:
+                    lease.failed = True # Recycle the driver, it may be blocked or broken
+                    break
+                pages_loaded += 1
+
+
+def checkpoint_unit(unit, events, error=None):
+    """Streams a finished page's days to the partitioned output and event store, then marks them in the checkpoint."""
+    if events is not None and (output_writer is not None or event_store is not None):
+        try:
+            with metrics.timer("write"):
+                for day, day_events in events_by_day(unit, events):
+                    if checkpoint is not None and checkpoint.unchanged(day, day_events):
+                        metrics.count(UNCHANGED_DAYS)
+                        continue # Re-fetched, but the rows are the ones already written
+                    # On a resumed run the partition may already hold rows of this day: from an earlier
+                    # fetch, a day that later failed, or a crash before the manifest line. Replace them.
+                    replace = checkpoint is not None and checkpoint.resumed
+                    if output_writer is not None:
+                        output_writer.write_day(day, day_events, replace=replace)
+                    if event_store is not None:
+                        event_store.write_day(day, day_events)
+        except Exception as e:
+            print(f"[Output] Could not write {unit}: {e}")
+            events, error = None, f"output write failed: {e}"
+    if events is None:
+        metrics.count(FAILED_PAGES, unit=str(unit), error=error)
+    else:
+        metrics.count(PAGES)
+        metrics.count(EMPTY_DAYS, sum(1 for _, day_events in events_by_day(unit, events) if not day_events))
+    if checkpoint is not None:
+        try:
+            checkpoint.record_unit(unit, events, error)
+        except Exception as e:
+            print(f"[Checkpoint] Could not record {unit}: {e}")
+    if ledger is not None:
+        try:
+            if not ledger.complete(unit, events is not None, error):
+                print(f"[Ledger] Another node took over {unit}; its rows from this node won't be merged.")
+        except Exception as e:
+            print(f"[Ledger] Could not complete {unit}: {e}") # The lease expires and another node retries it
 
-    all_scraped_data = []
-    
-    with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
-        future_to_chunk = {}
-        for i, (chunk_start, chunk_end) in enumerate(date_chunks):
-            future = executor.submit(scrape_date_range_worker, chunk_start, chunk_end, f"{i+1}")
-            future_to_chunk[future] = (chunk_start, chunk_end)
-            # Stagger initial driver setups by a bit more
-            if i < NUM_WORKERS * 2: # Stagger the first few batches of workers more
-                 time.sleep(2) # Increased stagger for initial worker launches
-            elif i > 0 and i % (NUM_WORKERS * 2) == 0 : # Then stagger less frequently
-                 time.sleep(5)
-
-
-        for future in as_completed(future_to_chunk):
-            chunk_start, chunk_end = future_to_chunk[future]
-            try:
-                chunk_data = future.result()
-                if chunk_data:
-                    all_scraped_data.extend(chunk_data)
-                print(f"Completed chunk: {chunk_start.strftime('%Y-%m-%d')} to {chunk_end.strftime('%Y-%m-%d')}. Events: {len(chunk_data if chunk_data else [])}")
-            except Exception as exc:
-                print(f"Chunk {chunk_start.strftime('%Y-%m-%d')} to {chunk_end.strftime('%Y-%m-%d')} generated an exception: {exc}")
-    
-    print("\nAll scraping tasks completed.")
 
-    if all_scraped_data:
+def fetch_units_async(units, concurrency):
+    """
+    Fetches units with the asyncio engine, using cookies harvested from one
+    pooled browser. Pages go to the pipeline as they arrive. Returns the
+    units the engine could not load (challenges, failures), for the browser workers.
+    """
+    from async_fetcher import AsyncFetchEngine, format_engine_stats  # aiohttp is only needed for --engine async
+    from http_fetcher import HybridFetcher
+
+    fetcher = http_fetcher or HybridFetcher()
+    with driver_pool.lease() as lease:
+        if lease.driver is None:
+            print("[Async] No browser to take cookies from; using the browser workers.")
+            return units
         try:
-            df = pd.DataFrame(all_scraped_data)
-            def robust_to_datetime(dt_str):
-                try:
-                    return pd.to_datetime(dt_str, format="%Y-%m-%d %H:%M:%S")
-                except ValueError:
-                    try:
-                        return pd.to_datetime(dt_str.split(' ')[0], format="%Y-%m-%d")
-                    except:
-                        return pd.NaT
-            df['parsed_datetime'] = df['datetime'].apply(robust_to_datetime)
-            df = df.sort_values(by='parsed_datetime').drop(columns=['parsed_datetime'])
+            fetcher.harvest(lease.driver)
         except Exception as e:
-            print(f"Could not sort by datetime due to parsing issues: {e}. Data will be in order of chunk completion.")
-            df = pd.DataFrame(all_scraped_data)
-
-        df = df[['datetime', 'currency', 'impact', 'event', 'actual', 'forecast', 'previous']]
-        
-        output_filename = f"forex_factory_data_{overall_start_date.strftime('%Y%m%d')}_to_{overall_end_date.strftime('%Y%m%d')}.csv"
-        df.to_csv(output_filename, index=False, encoding='utf-8-sig')
-        print(f"\nData saved to {output_filename}")
-        print(f"Total events scraped: {len(df)}")
-        print("Sample of scraped data (first 5 rows):")
-        print(df.head())
-        print("Sample of scraped data (last 5 rows):")
-        print(df.tail())
+            print(f"[Async] Could not harvest browser cookies ({e}); using the browser workers.")
+            return units
+    cookies, headers = fetcher.export_session()
+    engine = AsyncFetchEngine(concurrency, cookies=cookies, headers=headers, rate_limiter=rate_limiter,
+                              metrics=metrics)
+    leftovers = []
+
+    def on_page(unit, page_html):
+        if page_html is None:
+            leftovers.append(unit)
+        else:
+            pipeline.put(unit, page_html)
+
+    print(f"[Async] Fetching {len(units)} pages, up to {concurrency} in flight...")
+    elapsed = engine.run_units(units, on_page, parse=False)
+    print(f"{format_engine_stats(engine.stats())} in {elapsed:.1f}s; {len(leftovers)} left for the browser.")
+    metrics.count(BROWSER_FALLBACKS, len(leftovers), source="async")
+    return leftovers
+
+
+def replay_from_cache(start_date, end_date, parse_workers):
+    """
+    Rebuilds the output from cached pages: blobs are read here, parsed by the
+    pipeline's process pool and written by its writer thread.
+    """
+    pages = plan_replay(html_cache, start_date, end_date)
+    rows_stored = 0
+
+    def write_replayed(page, events, error):
+        nonlocal rows_stored
+        unit, days = page
+        if events is None:
+            print(f"[Replay] Skipped {unit}: {error}")
+            return
+        with metrics.timer("write"):
+            for day, day_events in events_by_day(unit._replace(start=days[0], end=days[-1]), events):
+                output_writer.write_day(day, day_events)
+            if event_store is not None:
+                # Upsert only: days missing from the cache must not wipe what the store already has
+                rows_stored += event_store.upsert_events(events)
+
+    with StagedPipeline(parse_replay_page, write_replayed, parse_workers,
+                        FETCHED_QUEUE_SIZE, PARSED_QUEUE_SIZE, metrics=metrics) as replay_pipeline:
+        for i, (unit, sha256, days) in enumerate(pages, start=1):
+            page_html = html_cache.read_blob(sha256)
+            replay_pipeline.put((unit, days), page_html, None if page_html is not None else "blob missing from cache")
+            if i % 200 == 0:
+                print(f"[Replay] {i}/{len(pages)} pages read | {format_depths(replay_pipeline.depths())}")
+    print(f"Replayed {len(pages)} cached pages covering {sum(len(days) for _, _, days in pages)} days "
+          f"with {replay_pipeline.parse_workers or 'no'} parser process(es).")
+    if event_store is not None:
+        print(f"Event store {event_store.path}: {rows_stored} rows written")
+
+
+def plan_pending_units(start_date, end_date, hot_window=None):
+    """
+    Pages still needed for the range: everything, only the unfinished days
+    when resuming, or those plus the days in hot_window (start, end) for a refresh.
+    """
+    if checkpoint is None:
+        return plan_fetches(start_date, end_date, FETCH_VIEW)
+    if hot_window is not None:
+        days = checkpoint.refresh_days(start_date, end_date, *hot_window)
     else:
+        days = checkpoint.pending_days(start_date, end_date)
+    units = []
+    for run_start, run_end in contiguous_ranges(days):
+        units.extend(plan_fetches(run_start, run_end, FETCH_VIEW))
+    return units
+
+
+def save_results(overall_start_date, overall_end_date, output_dir=""):
+    """Sorts the streamed partitions and merges them into the final CSV, in output_dir (default: the cwd)."""
+    output_filename = os.path.join(
+        output_dir,
+        f"forex_factory_data_{overall_start_date.strftime('%Y%m%d')}_to_{overall_end_date.strftime('%Y%m%d')}.csv")
+    total = output_writer.finalize(output_filename, overall_start_date, overall_end_date)
+    if not total:
         print("\nNo data was scraped for the specified date range.")
+        return
+    print(f"\nData saved to {output_filename} (partitions in {output_writer.root})")
+    print(f"Total events scraped: {total}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-threaded Forex Factory calendar scraper.")
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2015, 1, 1), help="First day, YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, default=date(2015, 3, 31), # e.g. 2024-12-31 for ~10 years of data
+                        help="Last day (inclusive), YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="Parallel browser workers")
+    parser.add_argument("--formats", nargs="+", choices=("csv", "parquet"), default=list(OUTPUT_FORMATS),
+                        help="Partition formats to write (parquet needs pyarrow)")
+    parser.add_argument("--replay", action="store_true",
+                        help="Rebuild the dataset from the HTML cache only, without opening a browser")
+    parser.add_argument("--cache-dir", default=HTML_CACHE_DIR, help="Raw HTML cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="Don't store loaded pages in the HTML cache")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the previous backfill: skip finished days and retry failed ones")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Incremental refresh: like --resume, but also re-fetch the hot window around today")
+    parser.add_argument("--hot-past", type=int, default=HOT_PAST_DAYS, help="Days before today that --refresh re-fetches")
+    parser.add_argument("--hot-future", type=int, default=HOT_FUTURE_DAYS,
+                        help="Days after today that --refresh re-fetches")
+    parser.add_argument("--ledger", help="Shared SQLite work ledger: scrape the range together with other machines")
+    parser.add_argument("--node-id", help="This machine's name in the ledger and its shard directory (default: host name)")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="How long a unit stays leased without a heartbeat before other nodes take it over")
+    parser.add_argument("--max-rate", type=float, default=MAX_PAGES_PER_SECOND,
+                        help="Most pages per second across all workers")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="Where the year/month partitions are written")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR, help="Per-day manifest directory (rows go to the --output-dir partitions)")
+    parser.add_argument("--engine", choices=("browser", "async"), default=FETCH_ENGINE,
+                        help="browser: threaded browser workers; async: asyncio HTTP engine with browser fallback")
+    parser.add_argument("--concurrency", type=int, default=ASYNC_CONCURRENCY, help="Pages in flight for --engine async")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_PROCESSES,
+                        help="Parser processes (default: one per core; 0 parses on a thread)")
+    parser.add_argument("--lean-browser", action="store_true", default=LEAN_BROWSER,
+                        help="Start Chrome without images, in a small window, with ads, trackers and fonts blocked")
+    parser.add_argument("--no-http", action="store_true",
+                        help="Load every page in the browser instead of over HTTP with the browser's cookies")
+    parser.add_argument("--store", default=EVENT_STORE_PATH, help="SQLite event store to upsert into")
+    parser.add_argument("--no-store", action="store_true", help="Don't write to the event store")
+    parser.add_argument("--site-tz", default=SITE_TIMEZONE,
+                        help="IANA timezone the calendar shows times in, e.g. America/New_York")
+    parser.add_argument("--metrics", default=METRICS_PATH, help="JSON lines file for per-phase timings and counters")
+    parser.add_argument("--no-metrics", action="store_true", help="Don't write the metrics file")
+    parser.add_argument("--prometheus-file", help="Also keep a Prometheus text file here (node_exporter textfile collector)")
+    parser.add_argument("--prometheus-port", type=int, help="Also serve Prometheus metrics on this port at /metrics")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    global metrics
+    args = parse_args(argv)
+    metrics = Metrics(None if args.no_metrics else args.metrics)
+    if args.prometheus_port:
+        metrics.serve_prometheus(args.prometheus_port)
+        print(f"Prometheus metrics on http://127.0.0.1:{args.prometheus_port}/metrics")
+    stop_exporter = metrics.start_exporter(METRICS_INTERVAL_SECONDS, args.prometheus_file)
+    try:
+        run(args)
+    finally:
+        stop_exporter.set()
+        if args.prometheus_file:
+            metrics.write_prometheus(args.prometheus_file)
+        metrics.close()
+
+
+def run(args):
+    global html_cache, checkpoint, driver_pool, rate_limiter, output_writer, event_store, http_fetcher, pipeline, ledger
+    overall_start_date = args.start
+    overall_end_date = args.end
+
+    range_name = f"{overall_start_date.strftime('%Y%m%d')}_to_{overall_end_date.strftime('%Y%m%d')}"
+    run_output_dir = os.path.join(args.output_dir, range_name)
+    if args.cache_dir and not args.no_cache:
+        html_cache = HtmlCache(args.cache_dir, max_bytes=HTML_CACHE_MAX_MB * 1024 * 1024)
+    if args.store and not args.no_store:
+        event_store = EventStore(args.store)
+
+    if args.replay:
+        if html_cache is None:
+            print("Replay needs the HTML cache; drop --no-cache.")
+            return
+        print(f"Replaying {overall_start_date} to {overall_end_date} from cache {args.cache_dir}")
+        # Own directory: the backfill's partitions hold the only copy of its rows, and the cache may not cover them all
+        replay_output_dir = os.path.join(args.output_dir, "replay", range_name)
+        output_writer = PartitionedWriter(replay_output_dir, args.formats, reset=True, site_timezone=args.site_tz)
+        replay_from_cache(overall_start_date, overall_end_date, args.parse_workers)
+        print(format_metrics(metrics.snapshot(), phases=("parse", "write")))
+        # Next to its partitions, so it never overwrites the backfill's merged CSV in the cwd
+        save_results(overall_start_date, overall_end_date, replay_output_dir)
+        return
+
+    # Only live scraping needs requests; replay returned above without it
+    from http_fetcher import HybridFetcher, format_fetch_stats
+
+    print(f"Starting Forex Factory Scraper for range: {overall_start_date} to {overall_end_date}")
+    print(f"Number of parallel workers: {args.workers}")
+    rate_limiter = AdaptiveRateLimiter(args.max_rate)
+    print(f"Rate limit: up to {args.max_rate} pages/s shared by all workers (adaptive)")
+
+    resume = args.resume or args.refresh
+    checkpoint_dir = args.checkpoint_dir
+    shards_root = run_output_dir
+    if args.ledger:
+        ledger = WorkLedger(args.ledger, args.node_id, args.lease_seconds)
+        # Each node writes its own shard; a restarted node continues it, the ledger decides what is left
+        run_output_dir = shard_dir(run_output_dir, ledger.node_id)
+        checkpoint_dir = shard_dir(checkpoint_dir, ledger.node_id)
+        resume = True
+    checkpoint = BackfillCheckpoint(checkpoint_dir, resume=resume)
+    output_writer = PartitionedWriter(run_output_dir, args.formats, reset=not resume,
+                                      site_timezone=args.site_tz)
+    if resume and ledger is None:
+        progress = checkpoint.summary(overall_start_date, overall_end_date)
+        print(f"Resuming from {checkpoint_dir}: {progress['done']} done, {progress['empty']} empty, "
+              f"{progress['failed']} failed, {progress['pending']} not started.")
+
+    if ledger is not None:
+        added = ledger.plan(plan_fetches(overall_start_date, overall_end_date, FETCH_VIEW))
+        work_queue = LedgerWorkQueue(ledger, overall_start_date, overall_end_date)
+        available = work_queue.progress()["remaining"]
+        print(f"Ledger {args.ledger}: node {ledger.node_id}, {added} units added, "
+              f"{available} of {work_queue.total} available (fetch view: {FETCH_VIEW})")
+        if args.engine == "async":
+            print("The async engine works on a fixed list of units; with --ledger the browser workers lease them.")
+        units = []
+        has_work = available > 0
+    else:
+        hot_window = None
+        if args.refresh:
+            today = date.today()
+            hot_window = (today - timedelta(days=args.hot_past), today + timedelta(days=args.hot_future))
+            print(f"Refresh: re-fetching {hot_window[0]} to {hot_window[1]} plus unfinished days; "
+                  f"unchanged days are not rewritten.")
+        units = plan_pending_units(overall_start_date, overall_end_date, hot_window)
+        print(f"Fetch view: {FETCH_VIEW} ({len(units)} page loads queued)")
+
+    pipeline = StagedPipeline(parse_unit_page, checkpoint_unit, args.parse_workers, FETCHED_QUEUE_SIZE, PARSED_QUEUE_SIZE,
+                              metrics=metrics)
+    driver_pool = DriverPool(lambda: setup_timed_driver(args.lean_browser), args.workers,
+                             max_pages_per_driver=MAX_PAGES_PER_DRIVER)
+    if HTTP_FAST_PATH and not args.no_http:
+        http_fetcher = HybridFetcher(pool_size=args.workers, metrics=metrics, rate_limiter=rate_limiter)
+    if args.engine == "async" and units:
+        try:
+            units = fetch_units_async(units, args.concurrency)
+        except BaseException:
+            driver_pool.close() # Don't leave the cookie browser running on Ctrl-C
+            pipeline.close()
+            raise
+    if ledger is None:
+        work_queue = WorkQueue(units)
+        has_work = bool(units)
+    if has_work:
+        print(f"Warming {args.workers} browser(s)...")
+        print(f"{driver_pool.warm()} browser(s) ready.")
+
+    stop_heartbeat = ledger.start_heartbeat() if ledger is not None else None
+    stop_reporter = start_progress_reporter(
+        work_queue, PROGRESS_INTERVAL_SECONDS,
+        extra=lambda: f"rate {rate_limiter.rate:.2f} pages/s | {format_depths(pipeline.depths())}")
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = [executor.submit(scrape_worker, f"{i+1}", work_queue) for i in range(args.workers if has_work else 0)]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as exc:
+                    print(f"A worker generated an exception: {exc}")
+        # Units nobody could take, e.g. because no browser would start
+        for unit in work_queue.drain():
+            pipeline.put(unit, None, "no driver available")
+    finally:
+        stop_reporter.set()
+        pipeline.close() # Parse and write every page already fetched, even on Ctrl-C
+        if ledger is not None:
+            stop_heartbeat.set()
+            released = ledger.release_all()
+            if released:
+                print(f"[Ledger] Released {released} unfinished lease(s) for the other nodes.")
+        print(format_progress(work_queue.progress()))
+        depths = pipeline.depths()
+        print(f"Pipeline: {depths['written']} pages written ({depths['failed']} failed) "
+              f"by {pipeline.parse_workers or 'no'} parser process(es).")
+        print(f"Rate limiter: {rate_limiter.rate:.2f} pages/s at the end, {rate_limiter.stats['throttled']} slow-downs.")
+        pool_stats = driver_pool.stats()
+        driver_pool.close()
+        print(f"Driver pool: {pool_stats['created']} started, {pool_stats['recycled']} recycled, "
+              f"{pool_stats['failed_setups']} failed setups, {pool_stats['leases']} leases.")
+        if http_fetcher is not None:
+            print(format_fetch_stats(http_fetcher.stats()))
+            http_fetcher.close()
+        print(format_metrics(metrics.snapshot()))
+        if metrics.jsonl_path:
+            print(f"Metrics: {metrics.jsonl_path}")
+    
+    if ledger is not None:
+        counts = ledger.summary(overall_start_date, overall_end_date)
+        print(f"\nNode {ledger.node_id} finished; {ledger.reclaimed} expired lease(s) reclaimed. "
+              f"Ledger: {counts['done']}/{counts['total']} units done, {counts['leased']} leased, "
+              f"{counts['pending'] + counts['retryable']} left.")
+        print(f"Shard written to {run_output_dir}. When every node is done, merge the shards with:\n"
+              f"  python work_ledger.py merge --ledger {args.ledger} --shards {shards_root}")
+        ledger.close()
+        return
+
+    print("\nAll scraping tasks completed.")
+    progress = checkpoint.summary(overall_start_date, overall_end_date)
+    print(f"Days: {progress['done']} done, {progress['empty']} empty, {progress['failed']} failed, {progress['pending']} not started.")
+    if progress['failed'] or progress['pending']:
+        print("Run again with --resume to fetch the remaining days.")
+    # The partitions keep growing across --resume runs, so the merged CSV includes earlier progress.
+    save_results(overall_start_date, overall_end_date)
+    if event_store is not None:
+        print(f"Event store {args.store}: {event_store.count()} events. Query it with: python event_store.py --help")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file